@@ -1,23 +1,63 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-import requests
+import asyncio
 import time
 from bs4 import BeautifulSoup
 
-def get_data(ticker: str, field: str):
-    # Это URL чтобы заходить в Yahoo
-    # Динамичексий URL
-    url = f"https://finance.yahoo.com/quote/{ticker}/financials"
+# Общий кэш HTTP ответов лежит уровнем выше: src/http_cache.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import http_cache
+
+# Это заголовок который помогает входить в сайт иммитируя действия пользователя
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+# Это URL чтобы заходить в Yahoo
+# Динамичексий URL
+def financials_url(ticker: str):
+    return f"https://finance.yahoo.com/quote/{ticker}/financials"
+
+
+# Один разбор страницы сразу для всех нужных полей
+# Возвращает {field: ('Total Revenue', '385,706,000', ...)} только для найденных полей
+def parse_fields(html: str, fields):
+    sup = BeautifulSoup(html, "html.parser")
+
+    # Тута скрипт ищет все элементы с "div" в которых будет class "row lv-0 yf-t22klz"
+    rows = sup.find_all('div', {'class': 'row lv-0 yf-t22klz'})
+
+    if not rows:
+        raise Exception("Financial data rows not found")
+
+    wanted = set(fields)
+    found = {}
+
+    for row in rows:
+        field_name_div = row.find('div', {'class': 'rowTitle yf-t22klz'})
+        field = field_name_div.get('title') if field_name_div else None
+
+        # Берем первую строку с таким названием, как и get_data
+        if field in wanted and field not in found:
+            columns = row.find_all('div', {'class': 'column yf-t22klz'})
+            found[field] = tuple([field] + [col.text.strip() for col in columns])
 
-    # Это заголовок который помогает входить в сайт иммитируя действия пользователя
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+            if len(found) == len(wanted):
+                break
 
-    # Отпрвляет Get запрос по url
-    # Получает requests.Response Response <Response> object
-    response = requests.get(url, headers=headers)
+    return found
+
+
+def get_data(ticker: str, field: str):
+    url = financials_url(ticker)
+    headers = HEADERS
+
+    # Отпрвляет Get запрос по url (или берет ответ из кэша http_cache)
+    # Получает объект с status_code и text
+    response = http_cache.get(url, headers=headers)
 
     # Если response.status_code == 200 то страница сайта запущена корректно
     # В ином случае (404, 500, 403) Дается ошибка 
@@ -27,34 +67,95 @@ def get_data(ticker: str, field: str):
     # Создается HTML парсер который будет парсить html скрипт в response.text
     # Используем встроенный в python парсер "html.parser"
     # С задержкой в исполнение в 5 секунд. Это нужно чтобы случайно не запустить ddos attack и снизить нагрузку на сайт
-    sup = BeautifulSoup(response.text, "html.parser")
-
-    time.sleep(5)
-
-    # Тута скрипт ищет все элементы с "div" в которых будет class "row lv-0 yf-t22klz" - Я не знаю как найти это не в ручную
-    # rows получает список объектов строк таблиц
-    rows = sup.find_all('div', {'class': 'row lv-0 yf-t22klz'})
+    found = parse_fields(response.text, [field])
 
-    if not rows:
-        raise Exception("Financial data rows not found")
+    # Ответ из кэша не нагружает сайт, ждать не нужно
+    if not response.from_cache:
+        time.sleep(5)
 
-    # Тута общая логика такая
-    # Проходимя по rows и ищем тот который содержит наш Field
-    # Нашли идем и извлекаем все остальные элементы с "div" в которых будут доп данные
-    # value берет на себя все эти элементы которые содержат текст и в конце преобразует их в tuple и возвращает их
     # value будет таким +- -> ('Total Revenue', '385,706,000', '396,017,000', '394,328,000')
     # В остальных случаях будет ошибка
-    for row in rows:
-        field_name_div = row.find('div', {'class': 'rowTitle yf-t22klz'})
+    if field not in found:
+        raise Exception("Requested not found")
+
+    return found[field]
+
+
+# Общий на все запросы ограничитель: не больше rate запросов в секунду
+# Каждый запрос занимает следующий свободный слот времени и ждет его
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Скачивает страницу тикера один раз и достает из нее все поля
+# Ответы из кэша не занимают слоты ограничителя
+# Чтение и запись кэша (gzip на диске) идут в отдельном потоке, как и разбор страницы
+async def fetch_fields(client, limiter: RateLimiter, cache, ticker: str, fields):
+    url = financials_url(ticker)
+    response = await asyncio.to_thread(cache.lookup, url, HEADERS)
+
+    if response is None:
+        await limiter.wait()
+        response = await client.get(url, headers=HEADERS)
+        await asyncio.to_thread(cache.store, url, HEADERS, response.status_code, response.text)
+
+    if response.status_code != 200:
+        raise Exception(f"Invalid URL {response.status_code}")
+
+    # Разбор страницы в отдельном потоке, чтобы не держать остальные загрузки
+    return await asyncio.to_thread(parse_fields, response.text, fields)
+
+
+# Таблица тикер x поле: страницы качаются параллельно через один пул соединений httpx.AsyncClient
+# table[ticker][field] - tuple как у get_data или None, если поля нет на странице
+# errors[ticker] - текст ошибки для тикеров, страницу которых получить не удалось
+async def fetch_table(tickers, fields, concurrency: int = 8, rate: float = 2.0, transport=None):
+    import httpx
+
+    limiter = RateLimiter(rate)
+    cache = http_cache.default_cache()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, transport=transport, follow_redirects=True, timeout=30) as client:
+
+        async def fetch(ticker):
+            async with semaphore:
+                try:
+                    return await fetch_fields(client, limiter, cache, ticker, fields)
+                except Exception as e:
+                    return e
+
+        tickers = list(dict.fromkeys(tickers))
+        results = await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+
+    table = {}
+    errors = {}
+
+    for ticker, found in zip(tickers, results):
+        if isinstance(found, Exception):
+            errors[ticker] = str(found)
+            found = {}
+
+        table[ticker] = {field: found.get(field) for field in fields}
+
+    return table, errors
 
-        if field_name_div and field_name_div.get('title') == field:
-            columns = row.find_all('div', {'class': 'column yf-t22klz'})
-        
-            values = [col.text.strip() for col in columns]
-    
-            return tuple([field] + values)
 
-    raise Exception("Requested not found")
+def get_data_many(tickers, fields, concurrency: int = 8, rate: float = 2.0, transport=None):
+    return asyncio.run(fetch_table(tickers, fields, concurrency, rate, transport))
 
 
 if __name__ == "__main__":
@@ -66,8 +167,27 @@ if __name__ == "__main__":
     ticker = little[1]
     field = little[2]
 
-    try:
-        res = get_data(ticker, field)
-        print(res)
-    except Exception as e:
-        print(e)
\ No newline at end of file
+    # Несколько тикеров или полей через запятую: ./financial.py "MSFT,AAPL" "Total Revenue,Net Income"
+    if ',' in ticker or ',' in field:
+        tickers = [item.strip() for item in ticker.split(',') if item.strip()]
+        fields = [item.strip() for item in field.split(',') if item.strip()]
+
+        table, errors = get_data_many(tickers, fields)
+
+        for name, row in table.items():
+            if name in errors:
+                print(name, errors[name])
+                continue
+
+            # Для поля, которого нет на странице, то же сообщение, что и у get_data
+            for requested, value in row.items():
+                if value is None:
+                    print(name, f"{requested}: Requested not found")
+                else:
+                    print(name, value)
+    else:
+        try:
+            res = get_data(ticker, field)
+            print(res)
+        except Exception as e:
+            print(e)
\ No newline at end of file
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-import requests
 import time
 from bs4 import BeautifulSoup
 
+# Общий кэш HTTP ответов лежит уровнем выше: src/http_cache.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import http_cache
+
 def get_data(ticker: str, field: str):
     url = f"https://finance.yahoo.com/quote/{ticker}/financials"
 
@@ -12,7 +16,7 @@ def get_data(ticker: str, field: str):
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'  
     }
 
-    respon = requests.get(url, headers=headers)
+    respon = http_cache.get(url, headers=headers)
 
     if respon.status_code != 200:
         raise Exception(f"Failed with {respon.status_code}")
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import httpx
 from bs4 import BeautifulSoup
 
+# Общий кэш HTTP ответов лежит уровнем выше: src/http_cache.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import http_cache
+
 
 def fetch_data_httpx(ticker: str, field: str):
     url = f"https://finance.yahoo.com/quote/{ticker}/financials"
@@ -14,12 +19,12 @@ def fetch_data_httpx(ticker: str, field: str):
     }
 
     # HTTP запрос
-    # Создается Http клиент и дается запрос
+    # Создается Http клиент и дается запрос (если ответа нет в кэше http_cache)
     with httpx.Client() as cl:
-        repo = cl.get(url, headers=headers)
+        repo = http_cache.default_cache().get(url, headers, cl.get)
 
         # Печатает URL по которому зашел
-        print(f"Request: {repo.url}")
+        print(f"Request: {url}{' (cache)' if repo.from_cache else ''}")
 
         if repo.status_code != 200:
             raise Exception(f"Failed with: {repo.status_code}")
@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 
+import os
 import pytest
 import sys
-import requests
 import time
+import asyncio
+import importlib.util
 from bs4 import BeautifulSoup
 
-def get_data(ticker: str, field: str):
-    # URL Запрос динамический
-    url = f"https://finance.yahoo.com/quote/{ticker}/financials"
+# Общий кэш HTTP ответов лежит уровнем выше: src/http_cache.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import http_cache
+
+# Заголовок имитирующий работу браузера чтоб yahoo не дала бан
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'  
+}
 
-    # Заголовок имитирующий работу браузера чтоб yahoo не дала бан
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'  
-    }
+# Сохраненная страница MSFT для тестов без сети
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'msft_financials.html')
 
-    respon = requests.get(url, headers=headers)
+def financials_url(ticker: str):
+    # URL Запрос динамический
+    return f"https://finance.yahoo.com/quote/{ticker}/financials"
+
+def get_data(ticker: str, field: str):
+    respon = http_cache.get(financials_url(ticker), headers=HEADERS)
 
     if respon.status_code != 200:
         raise Exception(f"Failed with {respon.status_code}")
@@ -36,6 +46,9 @@ def get_data(ticker: str, field: str):
                     val = [cl.text.strip() for cl in col]
 
                     return tuple([field] + val)
+
+        # Строки есть, но нужного поля среди них нет (как в ex03/financial.py)
+        raise Exception("Requested not found")
     
     else:
         raise Exception(f"Data not found")
@@ -55,7 +68,23 @@ if __name__ == "__main__":
 # Проверка - Запещен pytest в этом интрепритаторе? 
 # sys.modules - это словарь. Keys там это работающие модули
 if 'pytest' in sys.modules:
-    def test_valid_data():
+    # В офлайн режиме (FINANCIAL_OFFLINE=1) get_data читает временный кэш с сохраненной
+    # страницей MSFT и ответом 404 для несуществующего тикера. Иначе ходит в сеть как обычно
+    # monkeypatch - встроенная фикстура pytest, меняет переменные окружения только на время теста
+    @pytest.fixture
+    def yahoo_pages(tmp_path, monkeypatch):
+        if not http_cache.default_cache().offline:
+            return
+
+        cache = http_cache.ResponseCache(str(tmp_path), offline=True)
+
+        with open(FIXTURE, 'r', encoding='utf-8') as file:
+            cache.store(financials_url("MSFT"), HEADERS, 200, file.read())
+
+        cache.store(financials_url("XYZ123"), HEADERS, 404, "Not Found")
+        monkeypatch.setenv('FINANCIAL_CACHE_DIR', str(tmp_path))
+
+    def test_valid_data(yahoo_pages):
         # Сохраняем данные с get_data 
         result = get_data("MSFT", "Total Revenue")
         # assert - встроенная функция для проверки условий 
@@ -64,12 +93,138 @@ if 'pytest' in sys.modules:
         assert isinstance(result, tuple)
         assert result[0] == "Total Revenue"
 
-    def test_invalid_ticker():
+    # Проверяем текст ошибки: иначе тест прошел бы и на CacheMiss, когда ответа нет в кэше
+    def test_invalid_ticker(yahoo_pages):
         # Тут get_data даст ошибку (испключение)
         # pytest.raises - контекстный менеджер который может обрабатывать иснлючения и останавливать тест если такого не будет
-        with pytest.raises(Exception):
+        with pytest.raises(Exception, match="Failed with|Data not found"):
             get_data("XYZ123", "Total Revenue")
 
-    def test_invalid_field():
-        with pytest.raises(Exception):
-            get_data("MSFT", "NonExistentField")
\ No newline at end of file
+    def test_invalid_field(yahoo_pages):
+        with pytest.raises(Exception, match="Requested not found"):
+            get_data("MSFT", "NonExistentField")
+
+    # Кэш проверяется без сети: вместо загрузки - функция, которая считает вызовы
+    # tmp_path - встроенная фикстура pytest, временный каталог
+    def test_response_cache(tmp_path):
+        calls = []
+
+        def download(url, headers):
+            calls.append(url)
+            return http_cache.CachedResponse(200, "<html>page</html>", False)
+
+        headers = {'User-Agent': 'test'}
+        cache = http_cache.ResponseCache(str(tmp_path), ttl=60, offline=False)
+
+        first = cache.get("https://example.com/a", headers, download)
+        second = cache.get("https://example.com/a", headers, download)
+
+        assert first.text == second.text == "<html>page</html>"
+        assert not first.from_cache and second.from_cache
+        assert len(calls) == 1
+
+        # Другие заголовки - другой ключ
+        cache.get("https://example.com/a", {'User-Agent': 'other'}, download)
+        assert len(calls) == 2
+
+    def test_response_cache_ttl_and_offline(tmp_path):
+        calls = []
+
+        def download(url, headers):
+            calls.append(url)
+            return http_cache.CachedResponse(404, "not found", False)
+
+        # ttl=0 - ответ сразу устаревает и скачивается заново
+        expired = http_cache.ResponseCache(str(tmp_path), ttl=0, offline=False)
+        expired.get("https://example.com/b", None, download)
+        expired.get("https://example.com/b", None, download)
+        assert len(calls) == 2
+
+        # В офлайн режиме устаревший ответ все равно отдается, а отсутствующий - ошибка
+        offline = http_cache.ResponseCache(str(tmp_path), ttl=0, offline=True)
+        assert offline.get("https://example.com/b", None, download).status_code == 404
+
+        with pytest.raises(http_cache.CacheMiss):
+            offline.get("https://example.com/missing", None, download)
+
+        assert len(calls) == 2
+
+    # Пакетная загрузка из ex03/financial.py: сеть заменяет httpx.MockTransport,
+    # который отдает сохраненную страницу MSFT и 404 для остальных тикеров и считает запросы.
+    # Кэш - пустой временный каталог, офлайн режим выключен, чтобы промахи шли в MockTransport
+    @pytest.fixture
+    def batch(tmp_path, monkeypatch):
+        httpx = pytest.importorskip("httpx")
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ex03', 'financial.py')
+        spec = importlib.util.spec_from_file_location("ex03_financial", path)
+        financial = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(financial)
+
+        monkeypatch.setenv('FINANCIAL_CACHE_DIR', str(tmp_path))
+        monkeypatch.delenv('FINANCIAL_OFFLINE', raising=False)
+
+        with open(FIXTURE, 'r', encoding='utf-8') as file:
+            page = file.read()
+
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+
+            if request.url.path == "/quote/MSFT/financials":
+                return httpx.Response(200, text=page)
+
+            return httpx.Response(404, text="Not Found")
+
+        return financial, httpx.MockTransport(handler), calls
+
+    def test_fetch_table(batch):
+        financial, transport, calls = batch
+        fields = ["Total Revenue", "NonExistentField"]
+
+        table, errors = financial.get_data_many(["MSFT", "XYZ123", "MSFT"], fields, rate=1000, transport=transport)
+
+        # Повторный тикер скачивается один раз
+        assert sorted(calls) == sorted([financials_url("MSFT"), financials_url("XYZ123")])
+
+        # Таблица тикер x поле: отсутствующее поле и тикер с ошибкой - None
+        assert list(table) == ["MSFT", "XYZ123"]
+        assert all(list(row) == fields for row in table.values())
+        assert table["MSFT"]["Total Revenue"] == get_data("MSFT", "Total Revenue")
+        assert table["MSFT"]["NonExistentField"] is None
+        assert table["XYZ123"] == {field: None for field in fields}
+
+        # Ошибка только у тикера, страницу которого получить не удалось
+        assert list(errors) == ["XYZ123"]
+        assert "404" in errors["XYZ123"]
+
+    def test_fetch_table_cache_skips_limiter(batch, monkeypatch):
+        financial, transport, calls = batch
+        financial.get_data_many(["MSFT", "XYZ123"], ["Total Revenue"], rate=1000, transport=transport)
+        assert len(calls) == 2
+
+        # Второй запуск берет обе страницы из кэша: ни запросов, ни ожидания слотов
+        waits = []
+
+        async def wait(self):
+            waits.append(self)
+
+        monkeypatch.setattr(financial.RateLimiter, 'wait', wait)
+        table, errors = financial.get_data_many(["MSFT", "XYZ123"], ["Total Revenue"], rate=1000, transport=transport)
+
+        assert len(calls) == 2
+        assert waits == []
+        assert table["MSFT"]["Total Revenue"][0] == "Total Revenue"
+        assert list(errors) == ["XYZ123"]
+
+    def test_rate_limiter(batch):
+        financial = batch[0]
+        limiter = financial.RateLimiter(rate=20)
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*(limiter.wait() for _ in range(3)))
+            return time.monotonic() - start
+
+        # Три ожидания при 20 в секунду занимают не меньше двух интервалов по 0.05 с
+        assert asyncio.run(run()) >= 2 * limiter.interval - 0.01
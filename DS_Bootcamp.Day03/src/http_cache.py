@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+from collections import namedtuple
+
+# Кэш HTTP ответов на диске для financial.py, financial_enhanced.py и financial_test.py
+# Один файл на запрос: <sha256 от URL и заголовков>.json.gz, внутри URL, статус, время и тело страницы
+# Настройка через переменные окружения:
+# FINANCIAL_CACHE_DIR - каталог кэша (по умолчанию src/.http_cache)
+# FINANCIAL_CACHE_TTL - сколько секунд ответ считается свежим (по умолчанию сутки)
+# FINANCIAL_OFFLINE=1 - в сеть не ходить, отвечать только из кэша (даже устаревшими ответами)
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache')
+DEFAULT_TTL = 24 * 60 * 60
+
+# Ответ в том виде, в котором его читают скрипты: response.status_code и response.text
+CachedResponse = namedtuple('CachedResponse', ['status_code', 'text', 'from_cache'])
+
+
+# Офлайн режим, а ответа в кэше нет
+class CacheMiss(Exception):
+    pass
+
+
+class ResponseCache:
+    def __init__(self, directory: str = None, ttl: float = None, offline: bool = None):
+        self.directory = directory or os.environ.get('FINANCIAL_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.ttl = ttl if ttl is not None else float(os.environ.get('FINANCIAL_CACHE_TTL', DEFAULT_TTL))
+        self.offline = offline if offline is not None else os.environ.get('FINANCIAL_OFFLINE') == '1'
+
+    # Ключ - URL и заголовки запроса (имена заголовков без учета регистра)
+    def key(self, url: str, headers=None):
+        items = sorted((name.lower(), value) for name, value in (headers or {}).items())
+        return hashlib.sha256(json.dumps([url, items]).encode('utf-8')).hexdigest()
+
+    def path(self, url: str, headers=None):
+        return os.path.join(self.directory, self.key(url, headers) + '.json.gz')
+
+    # Ответ из кэша или None, если его нет или он устарел
+    # В офлайн режиме возраст не важен, а отсутствие ответа - ошибка CacheMiss
+    def lookup(self, url: str, headers=None):
+        try:
+            with gzip.open(self.path(url, headers), 'rt', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is not None and (self.offline or time.time() - entry['stored'] < self.ttl):
+            return CachedResponse(entry['status'], entry['text'], True)
+
+        if self.offline:
+            raise CacheMiss(f"No cached response for {url} (offline mode)")
+
+        return None
+
+    # Сохраняем только воспроизводимые ответы: 429 и ошибки сервера не кэшируются
+    def store(self, url: str, headers, status_code: int, text: str):
+        if status_code >= 500 or status_code == 429:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(url, headers)
+        entry = {'url': url, 'status': status_code, 'stored': time.time(), 'text': text}
+
+        # Пишем во временный файл и переименовываем, чтобы параллельные запуски не читали половину файла
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temporary, 'wt', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(temporary, path)
+
+    # download(url, headers) -> объект с status_code и text (requests.get, httpx.Client.get и т.п.)
+    def get(self, url: str, headers=None, download=None):
+        cached = self.lookup(url, headers)
+
+        if cached is not None:
+            return cached
+
+        if download is None:
+            import requests
+            download = requests.get
+
+        response = download(url, headers=headers)
+        self.store(url, headers, response.status_code, response.text)
+
+        return CachedResponse(response.status_code, response.text, False)
+
+    # Удаляет устаревшие ответы, возвращает их число
+    def prune(self):
+        removed = 0
+
+        if not os.path.isdir(self.directory):
+            return removed
+
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+
+            if name.endswith('.json.gz') and time.time() - os.path.getmtime(path) >= self.ttl:
+                os.remove(path)
+                removed += 1
+
+        return removed
+
+
+# Общий кэш с настройками из переменных окружения
+def default_cache():
+    return ResponseCache()
+
+
+# Замена requests.get(url, headers=headers) с кэшем
+def get(url: str, headers=None):
+    return default_cache().get(url, headers)
+
+
+if __name__ == "__main__":
+    little = sys.argv
+
+    # ./http_cache.py prune - удалить устаревшие ответы
+    if len(little) == 2 and little[1] == 'prune':
+        cache = default_cache()
+        print(f"Removed {cache.prune()} expired responses from {cache.directory}")
+    else:
+        print("Должно быть - ./http_cache.py prune")
@@ -0,0 +1,114 @@
+import os
+import sys
+import random
+import tempfile
+import timeit
+
+from movielens_analysis import Ratings, convert_ratings, profiling, profile_summary
+from movielens_ann import IVFIndex
+
+
+# Генерирует синтетический датасет в формате ml-latest-small (ratings.csv + movies.csv)
+# Фильмы разбиты на жанровые кластеры, каждый пользователь предпочитает пару кластеров,
+# поэтому у фильмов есть осмысленные соседи
+def make_synthetic_dataset(directory, n_users=2000, n_movies=5000, ratings_per_user=60, n_clusters=40, seed=21):
+    rng = random.Random(seed)
+    cluster_of = [rng.randrange(n_clusters) for _ in range(n_movies)]
+    movies_by_cluster = [[] for _ in range(n_clusters)]
+
+    for movie, cluster in enumerate(cluster_of, start=1):
+        movies_by_cluster[cluster].append(movie)
+
+    with open(os.path.join(directory, 'movies.csv'), 'w', encoding='utf-8') as f:
+        f.write('movieId,title,genres\n')
+
+        for movie, cluster in enumerate(cluster_of, start=1):
+            f.write(f'{movie},Movie {movie} ({1950 + movie % 70}),Genre{cluster}\n')
+
+    with open(os.path.join(directory, 'ratings.csv'), 'w', encoding='utf-8') as f:
+        f.write('userId,movieId,rating,timestamp\n')
+
+        for user in range(1, n_users + 1):
+            favourites = rng.sample(range(n_clusters), 2)
+            seen = set()
+
+            for _ in range(ratings_per_user):
+                # 80% оценок - любимые кластеры, остальное - случайные фильмы
+                if rng.random() < 0.8:
+                    movie = rng.choice(movies_by_cluster[rng.choice(favourites)])
+                    rating = rng.choice([3.5, 4.0, 4.5, 5.0])
+                else:
+                    movie = rng.randint(1, n_movies)
+                    rating = rng.choice([0.5, 1.0, 1.5, 2.0, 2.5, 3.0])
+
+                if movie in seen:
+                    continue
+
+                seen.add(movie)
+                f.write(f'{user},{movie},{rating},{rng.randint(828124615, 1537799250)}\n')
+
+    return os.path.join(directory, 'ratings.csv')
+
+
+# Доля точных соседей, найденных приближённым поиском
+def recall(exact, approximate):
+    return len(set(exact) & set(approximate)) / len(exact) if exact else 1.0
+
+
+def bench_ivf(ratings, k=10, n_queries=200):
+    exact_index = IVFIndex.from_ratings(ratings, kind='movies', n_lists=1, iterations=0)
+    queries = random.Random(42).sample(sorted(exact_index.ids.tolist()), min(n_queries, len(exact_index.ids)))
+
+    def exact_search():
+        return [exact_index.exact_query(exact_index.vector(q), k, exclude=q) for q in queries]
+
+    exact_time = timeit.timeit(exact_search, number=1)
+    truth = exact_search()
+    print(f"exact: {exact_time / len(queries) * 1000:.3f} ms/query")
+
+    for n_lists in [32, 64]:
+        build_time = timeit.timeit(lambda: IVFIndex.from_ratings(ratings, kind='movies', n_lists=n_lists), number=1)
+        index = IVFIndex.from_ratings(ratings, kind='movies', n_lists=n_lists)
+
+        for n_probe in [1, 2, 4, 8]:
+            approximate = [index.neighbours(q, k, n_probe) for q in queries]
+            elapsed = timeit.timeit(lambda: [index.neighbours(q, k, n_probe) for q in queries], number=1)
+            mean_recall = sum(recall(t, a) for t, a in zip(truth, approximate)) / len(queries)
+
+            print(f"ivf lists={n_lists} (build {build_time:.1f}s) n_probe={n_probe}: "
+                  f"{elapsed / len(queries) * 1000:.3f} ms/query, recall@{k} = {mean_recall:.3f}")
+
+
+# Время и память загрузчиков Ratings на синтетическом датасете
+def bench_profile(path):
+    with profiling() as records:
+        ratings = Ratings(path)
+        ratings.movies.top_by_ratings(10)
+        ratings.users.top_controversial(10)
+
+    print(profile_summary(records))
+
+
+# Гистограмма рейтингов за 2015-2018 годы: полный CSV против партиций с отсечением
+def bench_store(path, directory):
+    store = os.path.join(directory, 'store')
+    convert_time = timeit.timeit(lambda: convert_ratings(path, store), number=1)
+    print(f"convert: {convert_time:.2f}s")
+
+    for name, source in [('csv', path), ('store', store)]:
+        elapsed = timeit.timeit(lambda: Ratings(source, years=(2015, 2018)).movies.dist_by_rating(), number=3) / 3
+        print(f"{name} years=(2015, 2018) dist_by_rating: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    little = sys.argv
+
+    # ./benchmark.py [USERS] [MOVIES]
+    n_users = int(little[1]) if len(little) > 1 else 2000
+    n_movies = int(little[2]) if len(little) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_synthetic_dataset(directory, n_users, n_movies)
+        bench_profile(path)
+        bench_store(path, directory)
+        bench_ivf(Ratings(path))
@@ -7,6 +7,7 @@ from collections import defaultdict, OrderedDict, Counter
 import datetime
 import re
 import time
+from functools import wraps
 
 
 """
@@ -37,6 +38,161 @@ def calculate_variance(data: list):
     
     return sum((x - mean_value) ** 2 for x in data) / (len(data) - 1)
 
+"""
+Инструментирование: время, CPU, строки и память загрузчиков и методов
+Включается переменными окружения (читаются при первом вызове):
+  MOVIELENS_PROFILE=1                   - записи копятся в PROFILE_RECORDS (пусто или 0 - выключено)
+  MOVIELENS_PROFILE=time                - то же без замеров памяти (они замедляют вызовы)
+  MOVIELENS_PROFILE_FILE=path.jsonl     - и ещё дописываются в файл как JSON lines
+Пик tracemalloc и прирост ru_maxrss меряет MemoryProbe из movielens_profile.py
+В PROFILE_RECORDS хранятся только последние PROFILE_LIMIT записей, полный журнал - в файле
+-------------------------------------------------------------------------
+"""
+
+PROFILE_ENV = 'MOVIELENS_PROFILE'
+PROFILE_FILE_ENV = 'MOVIELENS_PROFILE_FILE'
+PROFILE_LIMIT = 10000
+
+PROFILE_RECORDS = []
+
+# enabled=None - переменные окружения ещё не прочитаны
+_profile = {'enabled': None, 'path': None, 'probes': [], 'records': PROFILE_RECORDS}
+
+# Проба памяти грузится только при включённом профилировании
+def _memory_probe():
+    from movielens_profile import MemoryProbe
+
+    return MemoryProbe()
+
+def _profiling_enabled():
+    if _profile['enabled'] is None:
+        level = os.environ.get(PROFILE_ENV, '').strip()
+        _profile['enabled'] = level not in ('', '0')
+        _profile['path'] = os.environ.get(PROFILE_FILE_ENV) or None
+        _profile['probes'] = [_memory_probe()] if _profile['enabled'] and level != 'time' else []
+
+    return _profile['enabled']
+
+# Включает профилирование внутри блока with независимо от переменных окружения
+# Записи блока собираются в отдельный список, который возвращает with
+# probes - объекты с enter() и exit(token) -> словарь дополнительных полей записи (по умолчанию MemoryProbe)
+class profiling:
+    def __init__(self, path=None, probes=None):
+        self.records = []
+        self.settings = {'enabled': True, 'path': path, 'probes': list(probes) if probes is not None else [_memory_probe()], 'records': self.records}
+        self.saved = None
+
+    def __enter__(self):
+        self.saved = dict(_profile)
+        _profile.update(self.settings)
+
+        return self.records
+
+    def __exit__(self, *exc_info):
+        _profile.update(self.saved)
+
+        return False
+
+def _record(record):
+    records = _profile['records']
+    records.append(record)
+
+    # Общий список ограничен: при долгой работе процесса старые записи отбрасываются
+    if records is PROFILE_RECORDS and len(records) > PROFILE_LIMIT:
+        del records[:len(records) - PROFILE_LIMIT]
+
+    if _profile['path']:
+        try:
+            with open(_profile['path'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+        except IOError as e:
+            raise IOError(f"Error writing to {_profile['path']}: {e}")
+
+def _instrument(func, name):
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not _profiling_enabled():
+            return func(self, *args, **kwargs)
+
+        probes = list(_profile['probes'])
+        tokens = [probe.enter() for probe in probes]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+
+            # Если конструктор упал, объект может быть недостроен
+            try:
+                rows = self._rows()
+            except AttributeError:
+                rows = None
+
+            record = {'name': name, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6), 'rows': rows}
+
+            # Пробы закрываем в обратном порядке, как вложенные блоки
+            for probe, token in reversed(list(zip(probes, tokens))):
+                record.update(probe.exit(token))
+
+            _record(record)
+
+    return wrapper
+
+# Декоратор класса: оборачивает __init__, публичные методы и перечисленные загрузчики
+def instrumented(*loaders):
+    def decorate(cls):
+        for name, attr in list(vars(cls).items()):
+            if isinstance(attr, type) or not callable(attr):
+                continue
+
+            if name == '__init__' or name in loaders or not name.startswith('_'):
+                setattr(cls, name, _instrument(attr, f"{cls.__qualname__}.{name}"))
+
+        return cls
+
+    return decorate
+
+# Сохраняет записи в JSON lines
+def export_profile(path, records=None):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in PROFILE_RECORDS if records is None else records:
+                f.write(json.dumps(record) + '\n')
+
+    except IOError as e:
+        raise IOError(f"Error writing to {path}: {e}")
+
+# Сводная таблица по записям: вызовы, суммарное время и наибольшее число строк за вызов
+# Поля проб суммируются, а поля с peak в названии берутся по максимуму
+def profile_summary(records=None):
+    records = PROFILE_RECORDS if records is None else records
+    extra = [field for field in OrderedDict.fromkeys(f for record in records for f in record) if field not in ('name', 'wall_s', 'cpu_s', 'rows')]
+    stats = OrderedDict()
+
+    for record in records:
+        row = stats.setdefault(record['name'], dict({'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'max_rows': 0}, **{field: 0 for field in extra}))
+        row['calls'] += 1
+        row['wall_s'] += record['wall_s']
+        row['cpu_s'] += record['cpu_s']
+        row['max_rows'] = max(row['max_rows'], record['rows'] or 0)
+
+        for field in extra:
+            value = record.get(field, 0)
+            row[field] = max(row[field], value) if 'peak' in field else row[field] + value
+
+    # Сортируем по убыванию суммарного времени
+    lines = [f"{'name':<40} {'calls':>6} {'wall_s':>10} {'cpu_s':>10} {'max_rows':>10}" + ''.join(f" {field:>16}" for field in extra)]
+
+    for name, row in sorted(stats.items(), key=lambda x: -x[1]['wall_s']):
+        lines.append(f"{name:<40} {row['calls']:>6} {row['wall_s']:>10.4f} {row['cpu_s']:>10.4f} {row['max_rows']:>10}"
+                     + ''.join(f" {round(row[field], 1):>16}" for field in extra))
+
+    return '\n'.join(lines)
+
 """
 Классы для обработки данных
 Основная логика
@@ -44,31 +200,78 @@ def calculate_variance(data: list):
 """
 
 # Класс для определения рейтинга
+@instrumented('_read_columns', '_load_titles')
 class Ratings:
-    def __init__(self, path):
-        # Словарь для хранения названий фильмов по ID
-        self.movie_titles = {}
+    # Номера и типы колонок в ratings.csv
+    COLUMNS = {'userId': (0, str), 'movieId': (1, str), 'rating': (2, float), 'timestamp': (3, int)}
+
+    # path - ratings.csv или каталог, созданный convert_ratings
+    # years=(2015, 2018) и movie_ids=(1, 1000) - включительные фильтры по году оценки и movieId
+    def __init__(self, path, years=None, movie_ids=None):
+        self.path = path.rstrip('/')
+        self.years = years
+        self.movie_ids = movie_ids
+        self._store = None
+
+        # Файл читается лениво, но об его отсутствии сообщаем сразу
+        if os.path.isdir(self.path):
+            self._store = self._load_metadata()
+
+        elif not os.path.isfile(self.path):
+            raise FileNotFoundError(f"File {path} not found.")
 
-        # Словари для группировки рейтингов по фильмам и пользователям
-        self.ratings_by_movie = defaultdict(list)
-        self.ratings_by_user = defaultdict(list)
+        # Загруженные колонки и группировки рейтингов. Заполняются по мере надобности
+        self._columns = {}
+        self._groups = {}
+        self._vectors = {}
+        self._matrices = {}
+        self._movie_titles = None
+        self._ratings_by_movie = None
+        self._ratings_by_user = None
+        self._movies = None
+        self._users = None
+
+        # Предрасчитанная таблица соседей фильмов (см. build_neighbours)
+        self.neighbours = None
+
+    # Сколько строк рейтингов загружено (для профилирования)
+    def _rows(self):
+        return len(next(iter(self._columns.values()))) if self._columns else 0
+
+    # Тот же источник с другими фильтрами. Ничего не читает до первого запроса
+    def where(self, years=None, movie_ids=None):
+        return Ratings(self.path, years=years, movie_ids=movie_ids)
+
+    # Словарь названий фильмов по ID. Читаем movies.csv только при первом обращении
+    @property
+    def movie_titles(self):
+        if self._movie_titles is None:
+            self._movie_titles = self._load_titles()
+
+        return self._movie_titles
+
+    # Путь к movies.csv: рядом с ratings.csv или внутри каталога convert_ratings
+    def _movies_path(self):
+        if self._store is not None:
+            return os.path.join(self.path, 'movies.csv')
 
         # Определяем путь к файлу movies.csv
-        dir = path.rfind('/')
+        dir = self.path.rfind('/')
 
         # Проверяет файл в этой директории? Так она может адаптироваться под ситуацию
         if dir == -1:
-            movies_path = 'movies.csv'  # Same directory if no '/'
-        else:
-            movies_path = path[:dir] + '/movies.csv'
-        
+            return 'movies.csv'  # Same directory if no '/'
+
+        return self.path[:dir] + '/movies.csv'
+
+    def _load_titles(self):
+        movie_titles = {}
+        movies_path = self._movies_path()
+
         try:
             # Читаем файл и расшифроем его. Для сопостовления названия и ID
             with open(movies_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                header = lines[0].strip()
-
-                for line in lines:
+                for line in f:
                     line = line.strip()
 
                     if not line:
@@ -82,8 +285,7 @@ class Ratings:
                     movie_id = parts[0]
 
                     title = ','.join(parts[1:-1])
-                    genres = parts[-1]
-                    self.movie_titles[movie_id] = title
+                    movie_titles[movie_id] = title
 
         except FileNotFoundError:
             raise FileNotFoundError(f"File {movies_path} not found.")
@@ -91,9 +293,41 @@ class Ratings:
         except IOError as e:
             raise IOError(f"Error reading {movies_path}: {e}")
 
+        return movie_titles
+
+    # Возвращает значения колонок. Парсятся только запрошенные колонки
+    def _load_columns(self, *names):
+        missing = [name for name in names if name not in self._columns]
+
+        if missing:
+            # Перечитываем уже загруженные колонки вместе с новыми,
+            # чтобы пропущенные битые строки совпадали во всех колонках
+            self._columns = self._read_columns(list(self._columns) + missing)
+
+        return [self._columns[name] for name in names]
+
+    # Границы фильтра по времени в секундах: [1 января первого года, 1 января следующего за последним)
+    def _time_range(self):
+        if self.years is None:
+            return None
+
+        first, last = self.years
+
+        return datetime.datetime(first, 1, 1).timestamp(), datetime.datetime(last + 1, 1, 1).timestamp()
+
+    def _read_columns(self, names):
+        if self._store is not None:
+            return self._read_store(names)
+
+        columns = {name: [] for name in names}
+        indexes = [self.COLUMNS[name][0] for name in names]
+        types = [self.COLUMNS[name][1] for name in names]
+        targets = [columns[name] for name in names]
+        time_range = self._time_range()
+
         try:
             # Читаем файл и расшифроем его. для сбора данных о рейтингах
-            with open(path, 'r', encoding='utf-8') as f:
+            with open(self.path, 'r', encoding='utf-8') as f:
                 # Пропускаем заголовок
                 header=next(f)
 
@@ -107,54 +341,313 @@ class Ratings:
                 
                     if len(parts) < 4:
                         continue
-                
-                    user_id = parts[0]
-                    movie_id = parts[1]
-                
+
                     try:
-                        rating = float(parts[2])
-                        timestamp = int(parts[3])
+                        values = [cast(parts[i]) for i, cast in zip(indexes, types)]
+
+                        # Фильтры проверяем только если они заданы
+                        if time_range and not time_range[0] <= int(parts[3]) < time_range[1]:
+                            continue
 
-                        # Сохраняем рейтинги по фильмам и пользователям
-                        self.ratings_by_movie[movie_id].append((user_id, rating, timestamp))
-                        self.ratings_by_user[user_id].append((movie_id, rating, timestamp))
+                        if self.movie_ids and not self.movie_ids[0] <= int(parts[1]) <= self.movie_ids[1]:
+                            continue
 
                     except ValueError:
                         continue
+
+                    for target, value in zip(targets, values):
+                        target.append(value)
+
         except FileNotFoundError:
-            raise FileNotFoundError(f"File {path} not found.")
+            raise FileNotFoundError(f"File {self.path} not found.")
     
+        except IOError as e:
+            raise IOError(f"Error reading {self.path}: {e}")
+
+        return columns
+
+    # Метаданные каталога, созданного convert_ratings
+    def _load_metadata(self):
+        metadata_path = os.path.join(self.path, STORE_METADATA)
+
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File {metadata_path} not found.")
+
+        except IOError as e:
+            raise IOError(f"Error reading {metadata_path}: {e}")
+
+    # Партиции, которые могут содержать строки под фильтры. Остальные даже не открываем
+    def _partitions(self):
+        time_range = self._time_range()
+
+        for partition in self._store['partitions']:
+            if time_range and not (time_range[0] <= partition['max']['timestamp'] and partition['min']['timestamp'] < time_range[1]):
+                continue
+
+            if self.movie_ids and not (self.movie_ids[0] <= partition['max']['movieId'] and partition['min']['movieId'] <= self.movie_ids[1]):
+                continue
+
+            yield partition
+
+    def _read_store(self, names):
+        columns = {name: [] for name in names}
+        time_range = self._time_range()
+
+        for partition in self._partitions():
+            directory = os.path.join(self.path, partition['path'])
+            low, high = partition['min'], partition['max']
+
+            # Построчная проверка нужна, только если партиция не целиком внутри фильтра
+            check_time = time_range and not (time_range[0] <= low['timestamp'] and high['timestamp'] < time_range[1])
+            check_movie = self.movie_ids and not (self.movie_ids[0] <= low['movieId'] and high['movieId'] <= self.movie_ids[1])
+
+            needed = set(names)
+
+            if check_time:
+                needed.add('timestamp')
+
+            if check_movie:
+                needed.add('movieId')
+
+            values = {name: read_store_column(os.path.join(directory, name + '.bin'), name) for name in needed}
+
+            if check_time or check_movie:
+                timestamps, movie_ids = values.get('timestamp'), values.get('movieId')
+                keep = [
+                    (not check_time or time_range[0] <= timestamps[i] < time_range[1]) and
+                    (not check_movie or self.movie_ids[0] <= movie_ids[i] <= self.movie_ids[1])
+                    for i in range(partition['rows'])
+                ]
+                values = {name: [value for value, kept in zip(column, keep) if kept] for name, column in values.items()}
+
+            for name in names:
+                cast = self.COLUMNS[name][1]
+                columns[name].extend(values[name] if cast is not str else map(str, values[name]))
+
+        return columns
+
+    # Рейтинги, сгруппированные по фильмам ('movieId') или пользователям ('userId')
+    # Хранит только оценки, без остальных колонок
+    def _grouped(self, key):
+        if key not in self._groups:
+            groups = defaultdict(list)
+
+            for group_id, rating in zip(*self._load_columns(key, 'rating')):
+                groups[group_id].append(rating)
+
+            self._groups[key] = groups
+
+        return self._groups[key]
+
+    # Полные группировки (id, rating, timestamp). Строятся при первом обращении
+    @property
+    def ratings_by_movie(self):
+        if self._ratings_by_movie is None:
+            self._ratings_by_movie = self._group_rows('movieId', 'userId')
+
+        return self._ratings_by_movie
+
+    @property
+    def ratings_by_user(self):
+        if self._ratings_by_user is None:
+            self._ratings_by_user = self._group_rows('userId', 'movieId')
+
+        return self._ratings_by_user
+
+    def _group_rows(self, key, other):
+        groups = defaultdict(list)
+        for group_id, other_id, rating, timestamp in zip(*self._load_columns(key, other, 'rating', 'timestamp')):
+            groups[group_id].append((other_id, rating, timestamp))
+
+        return groups
+
+    # Разреженные векторы оценок пользователей: пользователь -> {фильм: оценка}
+    # Для adjusted_cosine из каждой оценки вычитается средняя оценка пользователя
+    def _rating_vectors(self, metric='cosine'):
+        if metric not in ('cosine', 'adjusted_cosine'):
+            raise ValueError(f"Unknown similarity metric: {metric}")
+
+        if metric not in self._vectors:
+            by_user = defaultdict(dict)
+
+            for user_id, movie_id, rating in zip(*self._load_columns('userId', 'movieId', 'rating')):
+                by_user[user_id][movie_id] = rating
+
+            if metric == 'adjusted_cosine':
+                for row in by_user.values():
+                    mean_value = calculate_mean(list(row.values()))
+
+                    for movie_id in row:
+                        row[movie_id] -= mean_value
+
+            self._vectors[metric] = by_user
+
+        return self._vectors[metric]
+
+    # Экспорт в scipy CSR матрицу пользователь×фильм (для adjusted_cosine - оценки минус среднее пользователя)
+    # Возвращает (матрица, id пользователей по строкам, id фильмов по столбцам)
+    def to_csr(self, metric='cosine'):
+        # scipy нужен только для матричных вычислений, поэтому импортируем его здесь
+        from scipy.sparse import csr_matrix
+
+        by_user = self._rating_vectors(metric)
+        user_ids = list(by_user)
+        column_of = {}
+
+        indptr, indices, data = [0], [], []
+
+        for user_id in user_ids:
+            row = sorted((column_of.setdefault(movie_id, len(column_of)), value) for movie_id, value in by_user[user_id].items())
+
+            for column, value in row:
+                indices.append(column)
+                data.append(value)
+
+            indptr.append(len(indices))
+
+        matrix = csr_matrix((data, indices, indptr), shape=(len(user_ids), len(column_of)))
+
+        return matrix, user_ids, list(column_of)
+
+    # Матрица фильм×пользователь из to_csr с нормированными строками
+    # Произведение её строк на неё же транспонированную - косинусное сходство фильмов
+    def _unit_movies(self, metric):
+        if metric not in self._matrices:
+            import numpy as np
+
+            matrix, _, movie_ids = self.to_csr(metric)
+            units = matrix.T.tocsr()
+
+            norms = np.sqrt(units.multiply(units).sum(axis=1)).A1
+            scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+            # Фильмы с нулевой нормой становятся пустыми строками и ни с чем не сходны
+            units = units.multiply(scale[:, None]).tocsr()
+            units.eliminate_zeros()
+
+            self._matrices[metric] = (units, units.T.tocsr(), movie_ids, {movie_id: i for i, movie_id in enumerate(movie_ids)})
+
+        return self._matrices[metric]
+
+    # Топ-K строки произведения: (movieId, сходство) без самого фильма
+    @staticmethod
+    def _top_neighbours(scores, row, movie_ids, k):
+        import numpy as np
+
+        keep = scores.indices != row
+        columns, values = scores.indices[keep], scores.data[keep]
+
+        # В Python сортируем только кандидатов не хуже K-го значения (вместе с равными ему)
+        if 0 < k < len(values):
+            threshold = np.partition(values, len(values) - k)[len(values) - k]
+            columns, values = columns[values >= threshold], values[values >= threshold]
+
+        top_movies = [(movie_ids[column], value) for column, value in zip(columns.tolist(), values.tolist())]
+
+        # Сортируем по убыванию сходства + по id для одинаковых значений
+        return sorted(top_movies, key=lambda x: (-x[1], x[0]))[:k]
+
+    # Топ-K похожих фильмов (movieId -> сходство) по cosine или adjusted_cosine
+    def similar_movies(self, movie_id, k=10, metric='cosine'):
+        movie_id = str(movie_id)
+
+        # Если есть подходящая предрасчитанная таблица, отвечаем из неё
+        table = self.neighbours
+
+        if table and table['metric'] == metric and table['k'] >= k:
+            return dict(table['movies'].get(movie_id, [])[:k])
+
+        units, columns, movie_ids, row_of = self._unit_movies(metric)
+        row = row_of.get(movie_id)
+
+        if row is None:
+            return {}
+
+        return dict(self._top_neighbours((units[row] @ columns).tocsr(), row, movie_ids, k))
+
+    # Предрасчёт топ-K соседей для всех фильмов. Если задан path, таблица сохраняется в JSON
+    # Сходство считается блоками по block_size фильмов: одно матричное произведение на блок
+    def build_neighbours(self, k=10, metric='cosine', path=None, block_size=512):
+        units, columns, movie_ids, _ = self._unit_movies(metric)
+        movies = {}
+
+        for start in range(0, len(movie_ids), block_size):
+            block = (units[start:start + block_size] @ columns).tocsr()
+
+            for offset in range(block.shape[0]):
+                row = start + offset
+                movies[movie_ids[row]] = self._top_neighbours(block[offset], row, movie_ids, k)
+
+        self.neighbours = {'metric': metric, 'k': k, 'movies': movies}
+
+        if path:
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(self.neighbours, f)
+
+            except IOError as e:
+                raise IOError(f"Error writing to {path}: {e}")
+
+        return self.neighbours
+
+    # Загрузка таблицы соседей, сохранённой build_neighbours
+    def load_neighbours(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.neighbours = json.load(f)
+
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File {path} not found.")
+
         except IOError as e:
             raise IOError(f"Error reading {path}: {e}")
-        
-        # Инициализируем подклассы для анализа фильмов и пользователей
-        self.movies = self.Movies(self)
-        self.users = self.Users(self)
+
+        return self.neighbours
+
+    # Подклассы для анализа фильмов и пользователей. Создаются при первом обращении
+    @property
+    def movies(self):
+        if self._movies is None:
+            self._movies = self.Movies(self)
+
+        return self._movies
+
+    @property
+    def users(self):
+        if self._users is None:
+            self._users = self.Users(self)
+
+        return self._users
 
     # Подкласс для анализа рейтингов фильмов
+    @instrumented()
     class Movies:
         def __init__(self, data):
             # Ссылка на основной объект Ratings
             self.data = data
 
+        def _rows(self):
+            return self.data._rows()
+
         # Распределение рейтингов по годам
         def dist_by_year(self): 
             counts = defaultdict(int)
 
-            for movie_id, ratings in self.data.ratings_by_movie.items():
-                for i in ratings:
-
-                    timestamp = i[2]
-
-                    try:
+            # Нужна только колонка timestamp
+            for timestamp in self.data._load_columns('timestamp')[0]:
+                try:
 
-                        # Преобразуем timestamp в дату
-                        date = datetime.datetime.fromtimestamp(timestamp)
-                        year = date.year
-                        counts[year] += 1
+                    # Преобразуем timestamp в дату
+                    date = datetime.datetime.fromtimestamp(timestamp)
+                    year = date.year
+                    counts[year] += 1
 
-                    except ValueError or OSError:
-                        continue
+                except ValueError or OSError:
+                    continue
 
             # Сортируем по году
             rating_by_year = sorted(counts.items(), key=lambda x: x[0])
@@ -166,11 +659,9 @@ class Ratings:
         def dist_by_rating(self):
             counts = defaultdict(int)
 
-            for movie_id, ratings in self.data.ratings_by_movie.items():
-                for rating_tuple in ratings:
-
-                    rating_val = rating_tuple[1]
-                    counts[rating_val] += 1
+            # Нужна только колонка rating. Группировки не строим
+            for rating_val in self.data._load_columns('rating')[0]:
+                counts[rating_val] += 1
             
             # Сортируем по значению рейтинга
             ratings_distribution = sorted(counts.items(), key=lambda x: x[0])
@@ -182,7 +673,7 @@ class Ratings:
         def top_by_num_of_ratings(self, n):
             movie_count = {}
 
-            for movie_id, ratings in self.data.ratings_by_movie.items():
+            for movie_id, ratings in self.data._grouped('movieId').items():
             
                 count = len(ratings)
                 title = self.data.movie_titles.get(movie_id, 'Unknown')
@@ -198,9 +689,7 @@ class Ratings:
         def top_by_ratings(self, n, metric='average'):
             movie_rating = {}
 
-            for movie_id, ratings in self.data.ratings_by_movie.items():
-            
-                rating_list = [rate[1] for rate in ratings]
+            for movie_id, rating_list in self.data._grouped('movieId').items():
             
                 if len(rating_list) == 0:
                     score = 0.0
@@ -225,9 +714,7 @@ class Ratings:
         def top_controversial(self, n):
             movie_var = {}
             
-            for movie_id, ratings in self.data.ratings_by_movie.items():
-            
-                rating_list = [rate[1] for rate in ratings]
+            for movie_id, rating_list in self.data._grouped('movieId').items():
             
                 if len(rating_list) == 0:
                     variance = 0.0
@@ -244,6 +731,7 @@ class Ratings:
             return dict(top_movies)
 
     # Подкласс для анализа рейтингов пользователей
+    @instrumented()
     class Users(Movies):
         def __init__(self, data):
             
@@ -254,7 +742,7 @@ class Ratings:
         def dist_by_num_of_ratings(self):
             user_ratings = defaultdict(int)
             
-            for user_id, ratings in self.data.ratings_by_user.items():
+            for user_id, ratings in self.data._grouped('userId').items():
                 num_ratings = len(ratings)
                 user_ratings[num_ratings] +=1
             
@@ -267,9 +755,7 @@ class Ratings:
         def dist_by_metric(self, metric='average'):
             user_ratings = defaultdict(int)
             
-            for user_id, ratings in self.data.ratings_by_user.items():
-                rating_list = [rate[1] for rate in ratings]
-            
+            for user_id, rating_list in self.data._grouped('userId').items():
                 if len(rating_list) == 0:
                     value = 0.0
                 else:
@@ -291,9 +777,7 @@ class Ratings:
         def top_controversial(self, n):
             user_var = {}
             
-            for user_id, ratings in self.data.ratings_by_user.items():
-                rating_list = [rate[1] for rate in ratings]
-            
+            for user_id, rating_list in self.data._grouped('userId').items():
                 if len(rating_list) == 0:
                     var = 0.0
                 else:
@@ -308,7 +792,100 @@ class Ratings:
             
             return dict(top_ratings)
 
+"""
+Партиционированное хранилище рейтингов
+Каталог партиций year=YYYY[/movie_bucket=N] с бинарными колонками
+(плоские массивы чисел, которые можно отобразить в память),
+metadata.json с min/max по каждой партиции и копия movies.csv
+-------------------------------------------------------------------------
+"""
+
+STORE_METADATA = 'metadata.json'
+
+# Типы колонок в бинарных файлах (форматы memoryview.cast)
+STORE_TYPES = {'userId': 'i', 'movieId': 'i', 'rating': 'd', 'timestamp': 'q'}
+
+# Читает колонку партиции одним read. Возвращает memoryview нужного типа без копирования в список
+def read_store_column(path, name):
+    try:
+        with open(path, 'rb') as f:
+            return memoryview(f.read()).cast(STORE_TYPES[name])
+
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File {path} not found.")
+
+    except IOError as e:
+        raise IOError(f"Error reading {path}: {e}")
+
+# Записывает колонку: значения раскладываются в буфер через memoryview и пишутся одним write
+def write_store_column(path, name, values):
+    code = STORE_TYPES[name]
+    buffer = bytearray(len(values) * memoryview(b'').cast(code).itemsize)
+    view = memoryview(buffer).cast(code)
+
+    for i, value in enumerate(values):
+        view[i] = value
+
+    view.release()
+
+    with open(path, 'wb') as f:
+        f.write(buffer)
+
+# Конвертирует ratings.csv в партиции по году (и по корзинам movieId, если задан movie_bucket)
+# movies.csv копируется в каталог, чтобы Ratings(store_dir) находил названия фильмов
+def convert_ratings(csv_path, store_dir, movie_bucket=None):
+    ratings = Ratings(csv_path)
+    partitions = defaultdict(lambda: {name: [] for name in STORE_TYPES})
+
+    for user_id, movie_id, rating, timestamp in zip(*ratings._load_columns('userId', 'movieId', 'rating', 'timestamp')):
+        year = datetime.datetime.fromtimestamp(timestamp).year
+        bucket = int(movie_id) // movie_bucket if movie_bucket else None
+        partition = partitions[(year, bucket)]
+
+        partition['userId'].append(int(user_id))
+        partition['movieId'].append(int(movie_id))
+        partition['rating'].append(rating)
+        partition['timestamp'].append(timestamp)
+
+    metadata = {'movie_bucket': movie_bucket, 'partitions': []}
+
+    try:
+        for (year, bucket), columns in sorted(partitions.items(), key=lambda x: (x[0][0], x[0][1] or 0)):
+            relative = f'year={year}' if bucket is None else f'year={year}/movie_bucket={bucket}'
+            directory = os.path.join(store_dir, relative)
+            os.makedirs(directory, exist_ok=True)
+
+            for name, values in columns.items():
+                write_store_column(os.path.join(directory, name + '.bin'), name, values)
+
+            metadata['partitions'].append({
+                'path': relative,
+                'year': year,
+                'movie_bucket': bucket,
+                'rows': len(columns['rating']),
+                'min': {name: min(values) for name, values in columns.items()},
+                'max': {name: max(values) for name, values in columns.items()},
+            })
+
+        os.makedirs(store_dir, exist_ok=True)
+
+        # Без movies.csv рядом с рейтингами каталог работает, пока не нужны названия фильмов
+        movies_path = ratings._movies_path()
+
+        if os.path.isfile(movies_path):
+            with open(movies_path, 'rb') as source, open(os.path.join(store_dir, 'movies.csv'), 'wb') as target:
+                target.write(source.read())
+
+        with open(os.path.join(store_dir, STORE_METADATA), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+
+    except IOError as e:
+        raise IOError(f"Error writing to {store_dir}: {e}")
+
+    return metadata
+
 # Для анализа тегов из датасета MovieLens
+@instrumented()
 class Tags:
     def __init__(self, path):
 
@@ -347,6 +924,9 @@ class Tags:
         except IOError as e:
             raise IOError(f"Error reading {path}: {e}")
 
+    def _rows(self):
+        return len(self.tags)
+
     # Топ-N тегов по количеству слов
     def most_words(self, n):
         tag_counts = {}
@@ -406,6 +986,7 @@ class Tags:
         return sorted(tags_with_word)
 
 # Класс для анализа метаданных из movies.csv датасета MovieLens
+@instrumented()
 class Movies:
     def __init__(self, path):
         self.movies = []
@@ -456,6 +1037,9 @@ class Movies:
         except IOError as e:
             raise IOError(f"Error reading {path}: {e}")
 
+    def _rows(self):
+        return len(self.movies)
+
     # Функция для распределения фильмов по годам выпуска
     def dist_by_release(self):
         count = defaultdict(int)
@@ -507,6 +1091,7 @@ class Movies:
         # Преобразуем список в OrderedDict для сохранения порядка сортировки и возвращаем до N индекса
         return OrderedDict(movies[:n])
 
+@instrumented('_fetch_page')
 class Links:
     def __init__(self, path, cache_file='imdb_data.json', limit=100):
         self.movie_links = {}  # movieId → imdbId
@@ -575,6 +1160,9 @@ class Links:
         except IOError as e:
             raise IOError(f"Error reading {self.cache_path}: {e}")
 
+    def _rows(self):
+        return len(self.movie_links)
+
     def _fetch_page(self, imdb_id):
         url = f'https://www.imdb.com/title/tt{imdb_id}/'
         
@@ -863,7 +1451,103 @@ class Test:
     def test_ratings_file_not_found(self):
         with pytest.raises(FileNotFoundError):
             Ratings('nonexistent/ratings.csv')
-
+    def test_ratings_lazy_projection(self, tmp_path):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n1,1,4.0,964982703\n2,1,3.5,964982224\n", encoding='utf-8')
+        ratings = Ratings(str(ratings_file))
+        # movies.csv рядом нет: гистограмма рейтингов не должна его читать
+        assert ratings.movies.dist_by_rating() == {3.5: 1, 4.0: 1}
+        assert list(ratings._columns) == ['rating']
+        assert ratings._groups == {}
+
+    def test_similar_movies(self, rate_movies):
+        result = list(rate_movies.data.similar_movies(1, 10).values())
+        assert result == sorted(result, reverse=True)
+        assert all(-1.0 <= v <= 1.0 + 1e-9 for v in result)
+    def test_similar_movies_unknown_metric(self, rate_movies):
+        with pytest.raises(ValueError):
+            rate_movies.data.similar_movies(1, 10, metric='jaccard')
+    def test_neighbours_table(self, rate_movies, tmp_path):
+        table_file = tmp_path / "neighbours.json"
+        ratings = rate_movies.data
+        expected = ratings.similar_movies(1, 5, metric='adjusted_cosine')
+        ratings.build_neighbours(5, metric='adjusted_cosine', path=str(table_file), block_size=1)
+        ratings.neighbours = None
+        ratings.load_neighbours(str(table_file))
+        assert ratings.similar_movies(1, 5, metric='adjusted_cosine') == expected
+    def test_similar_movies_only_on_ratings(self, rate_movies, users):
+        assert not hasattr(rate_movies, 'similar_movies') and not hasattr(users, 'build_neighbours')
+
+    def test_ratings_store_pruning(self, tmp_path):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n"
+                                "1,1,4.0,1435000000\n1,50,3.0,1466000000\n"
+                                "2,1,2.5,1497000000\n2,900,5.0,1529000000\n", encoding='utf-8')
+        store = tmp_path / "store"
+        metadata = convert_ratings(str(ratings_file), str(store), movie_bucket=100)
+        assert sum(p['rows'] for p in metadata['partitions']) == 4
+        ratings = Ratings(str(store), years=(2016, 2017), movie_ids=(1, 100))
+        assert len(list(ratings._partitions())) == 2
+        assert ratings.movies.dist_by_rating() == {2.5: 1, 3.0: 1}
+        assert ratings.movies.dist_by_rating() == Ratings(str(ratings_file), years=(2016, 2017), movie_ids=(1, 100)).movies.dist_by_rating()
+        assert Ratings(str(store)).users.dist_by_num_of_ratings() == {2: 2}
+    def test_ratings_store_titles(self, tmp_path):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n1,1,4.0,964982703\n2,1,3.5,964982224\n", encoding='utf-8')
+        (tmp_path / "movies.csv").write_text("movieId,title,genres\n1,Toy Story (1995),Comedy\n", encoding='utf-8')
+        store = tmp_path / "data" / "store"
+        convert_ratings(str(ratings_file), str(store))
+        assert isinstance(read_store_column(str(store / "year=2000" / "rating.bin"), 'rating'), memoryview)
+        assert Ratings(str(store)).movies.top_by_num_of_ratings(1) == {'Toy Story (1995)': 2}
+
+    def test_profiling_records(self, tmp_path):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n1,1,4.0,964982703\n2,1,3.5,964982224\n", encoding='utf-8')
+        profile_file = tmp_path / "profile.jsonl"
+        with profiling(str(profile_file)) as records:
+            Ratings(str(ratings_file)).movies.dist_by_rating()
+        names = [record['name'] for record in records]
+        assert names == ['Ratings.__init__', 'Ratings.Movies.__init__', 'Ratings._read_columns', 'Ratings.Movies.dist_by_rating']
+        assert records[-1]['rows'] == 2
+        assert all(record['wall_s'] >= 0 and record['cpu_s'] >= 0 for record in records)
+        assert all('peak_kb' in record and 'maxrss_delta_kb' in record for record in records)
+        assert len(profile_file.read_text(encoding='utf-8').splitlines()) == 4
+        summary = profile_summary(records)
+        assert 'Ratings.Movies.dist_by_rating' in summary and 'max_rows' in summary and 'peak_kb' in summary
+    def test_profiling_env(self, tmp_path, monkeypatch):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n1,1,4.0,964982703\n", encoding='utf-8')
+        profile_file = tmp_path / "profile.jsonl"
+        monkeypatch.setitem(_profile, 'path', None)
+        monkeypatch.setitem(_profile, 'enabled', None)
+        monkeypatch.setenv(PROFILE_ENV, '0')
+        monkeypatch.setenv(PROFILE_FILE_ENV, str(profile_file))
+        Ratings(str(ratings_file))
+        assert not profile_file.exists()
+        monkeypatch.setitem(_profile, 'enabled', None)
+        monkeypatch.setenv(PROFILE_ENV, '1')
+        Ratings(str(ratings_file))
+        lines = profile_file.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1 and 'peak_kb' in json.loads(lines[0])
+        monkeypatch.setitem(_profile, 'enabled', None)
+        monkeypatch.setenv(PROFILE_ENV, 'time')
+        Ratings(str(ratings_file))
+        lines = profile_file.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 2 and 'peak_kb' not in json.loads(lines[1])
+    def test_profiling_records_limit(self, tmp_path, monkeypatch):
+        ratings_file = tmp_path / "ratings.csv"
+        ratings_file.write_text("userId,movieId,rating,timestamp\n1,1,4.0,964982703\n", encoding='utf-8')
+        monkeypatch.setitem(globals(), 'PROFILE_LIMIT', 2)
+        monkeypatch.setitem(_profile, 'enabled', True)
+        monkeypatch.setitem(_profile, 'path', None)
+        monkeypatch.setitem(_profile, 'probes', [])
+        saved = list(PROFILE_RECORDS)
+        try:
+            for _ in range(3):
+                Ratings(str(ratings_file))
+            assert len(PROFILE_RECORDS) == 2
+        finally:
+            PROFILE_RECORDS[:] = saved
     #RatingsUsers
     def test_dist_by_num_of_ratings(self, users):
         assert isinstance(users.dist_by_num_of_ratings(), dict)
@@ -972,4 +1656,8 @@ if __name__ == '__main__':
     # print(links.most_expensive(2))
     # print(links.most_profitable(2))
     # print(links.longest(2))
-    # print(links.top_cost_per_minute(5))
\ No newline at end of file
+    # print(links.top_cost_per_minute(5))
+
+    # Сводка профилирования, если оно включено через MOVIELENS_PROFILE
+    if PROFILE_RECORDS:
+        print(profile_summary())
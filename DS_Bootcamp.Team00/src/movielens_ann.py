@@ -0,0 +1,223 @@
+import sys
+import pytest
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from movielens_analysis import Ratings
+
+
+"""
+Приближённый поиск ближайших соседей по векторам оценок
+Вынесен из movielens_analysis.py: индекс считается на NumPy и хранится в .npz
+-------------------------------------------------------------------------
+"""
+
+# Строки CSR матрицы, делённые на их нормы. Возвращает (единичные векторы, нормы)
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    return csr_matrix(matrix.multiply(scale[:, None])), norms
+
+# Топ-K (id, сходство) по убыванию сходства + по id для одинаковых значений
+def top_k(ids, scores, k):
+    # В Python сортируем только кандидатов не хуже K-го значения (вместе с равными ему)
+    if 0 < k < len(scores):
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        ids, scores = ids[scores >= threshold], scores[scores >= threshold]
+
+    return dict(sorted(zip(ids.tolist(), scores.tolist()), key=lambda x: (-x[1], x[0]))[:k])
+
+# IVF индекс для векторов оценок фильмов или пользователей
+# Векторы кластеризуются сферическим k-means, запрос сравнивается с центроидами
+# и точно переранжирует только элементы n_probe ближайших кластеров.
+# n_lists задаётся при построении, n_probe - при запросе: больше n_probe - выше recall и медленнее
+class IVFIndex:
+    def __init__(self, n_lists=64, iterations=5, seed=21):
+        self.n_lists = n_lists
+        self.iterations = iterations
+        self.seed = seed
+
+        # id элементов и единичные векторы строками CSR матрицы (для точного переранжирования)
+        self.ids = np.array([], dtype=str)
+        self.units = csr_matrix((0, 0))
+        self._row_of = {}
+
+        # Центроиды (n_lists x размерность), номера строк по кластерам и границы кластеров в order
+        self.centroids = np.zeros((0, 0))
+        self.order = np.array([], dtype=np.int64)
+        self.offsets = np.array([0], dtype=np.int64)
+
+    # Строит индекс по матрице Ratings.to_csr: kind='movies' (векторы по пользователям) или 'users' (по фильмам)
+    @classmethod
+    def from_ratings(cls, ratings, kind='movies', metric='cosine', **params):
+        matrix, user_ids, movie_ids = ratings.to_csr(metric)
+        index = cls(**params)
+
+        if kind == 'movies':
+            index.build(matrix.T.tocsr(), movie_ids)
+        else:
+            index.build(matrix, user_ids)
+
+        return index
+
+    # vectors - CSR матрица (элементы x измерения), ids - id элементов по строкам
+    def build(self, vectors, ids):
+        self.units, norms = normalize_rows(csr_matrix(vectors, dtype=np.float64))
+        self.ids = np.array([str(item_id) for item_id in ids])
+        self._row_of = {item_id: row for row, item_id in enumerate(self.ids.tolist())}
+
+        # Нулевые векторы ни на что не похожи и в кластеры не попадают
+        rows = np.flatnonzero(norms > 0)
+        units = self.units[rows]
+        rng = np.random.default_rng(self.seed)
+
+        n_lists = min(self.n_lists, len(rows))
+        self.centroids = units[rng.choice(len(rows), n_lists, replace=False)].toarray()
+
+        for iteration in range(self.iterations + 1):
+            # Назначаем каждый вектор ближайшему центроиду
+            assignment = np.asarray(units @ self.centroids.T).argmax(axis=1) if n_lists else np.array([], dtype=np.int64)
+
+            if iteration == self.iterations:
+                break
+
+            # Центроид = нормированная сумма векторов кластера. Пустой кластер получает случайный вектор
+            members = csr_matrix((np.ones(len(rows)), (assignment, np.arange(len(rows)))), shape=(n_lists, len(rows)))
+            sums = np.asarray((members @ units).todense())
+            empty = np.flatnonzero(members.getnnz(axis=1) == 0)
+            sums[empty] = units[rng.choice(len(rows), len(empty))].toarray()
+
+            norms = np.linalg.norm(sums, axis=1)
+            self.centroids = sums / np.where(norms > 0, norms, 1.0)[:, None]
+
+        # Списки кластеров: строки, отсортированные по кластеру, и границы кластеров
+        self.order = rows[np.argsort(assignment, kind='stable')]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+
+    # Запрос: CSR строка или плотный вектор в измерениях индекса
+    def _unit(self, vector):
+        vector = csr_matrix(vector, dtype=np.float64).reshape(1, self.units.shape[1])
+        unit, norms = normalize_rows(vector)
+
+        return unit if norms[0] > 0 else None
+
+    # Приближённый топ-K: id -> косинусное сходство
+    def query(self, vector, k=10, n_probe=4, exclude=None):
+        unit = self._unit(vector)
+
+        if unit is None or not len(self.centroids):
+            return {}
+
+        scores = np.asarray(unit @ self.centroids.T).ravel()
+        nearest = np.argsort(-scores, kind='stable')[:n_probe]
+        rows = np.concatenate([self.order[self.offsets[cluster]:self.offsets[cluster + 1]] for cluster in nearest])
+
+        return self._rerank(unit, rows, k, exclude)
+
+    # Точный топ-K полным перебором. Эталон для оценки recall
+    def exact_query(self, vector, k=10, exclude=None):
+        unit = self._unit(vector)
+
+        if unit is None:
+            return {}
+
+        return self._rerank(unit, np.arange(len(self.ids)), k, exclude)
+
+    def _rerank(self, unit, rows, k, exclude):
+        if exclude is not None and str(exclude) in self._row_of:
+            rows = rows[rows != self._row_of[str(exclude)]]
+
+        scores = np.asarray((self.units[rows] @ unit.T).todense()).ravel()
+
+        return top_k(self.ids[rows], scores, k)
+
+    # Единичный вектор элемента, уже добавленного в индекс
+    def vector(self, item_id):
+        row = self._row_of.get(str(item_id))
+
+        return None if row is None else self.units[row]
+
+    # Соседи элемента, уже добавленного в индекс
+    def neighbours(self, item_id, k=10, n_probe=4):
+        vector = self.vector(item_id)
+
+        if vector is None:
+            return {}
+
+        return self.query(vector, k, n_probe, exclude=item_id)
+
+    # Сохраняем индекс в .npz: параметры, векторы в CSR, центроиды и списки
+    def save(self, path):
+        try:
+            np.savez(
+                path,
+                params=np.array([self.n_lists, self.iterations, self.seed]),
+                ids=self.ids,
+                shape=np.array(self.units.shape),
+                data=self.units.data,
+                indices=self.units.indices,
+                indptr=self.units.indptr,
+                centroids=self.centroids,
+                order=self.order,
+                offsets=self.offsets,
+            )
+
+        except IOError as e:
+            raise IOError(f"Error writing to {path}: {e}")
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index = cls(*data['params'].tolist())
+                index.ids = data['ids']
+                index.units = csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+                index.centroids = data['centroids']
+                index.order = data['order']
+                index.offsets = data['offsets']
+
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File {path} not found.")
+
+        except IOError as e:
+            raise IOError(f"Error reading {path}: {e}")
+
+        index._row_of = {item_id: row for row, item_id in enumerate(index.ids.tolist())}
+
+        return index
+
+"""
+Tests
+-------------------------------------------------------------------------
+"""
+
+class Test:
+    def test_ivf_index_finds_itself(self):
+        index = IVFIndex(n_lists=2)
+        index.build(csr_matrix([[1.0, 2.0, 0.0], [1.0, 2.1, 0.0], [0.0, 0.0, 5.0]]), [1, 2, 3])
+        assert list(index.query(np.array([1.0, 2.0, 0.0]), k=1)) == ['1']
+        assert list(index.neighbours(1, k=1, n_probe=1)) == ['2']
+    def test_ivf_index_all_lists_is_exact(self):
+        matrix = csr_matrix(np.random.default_rng(0).random((50, 8)))
+        index = IVFIndex(n_lists=4)
+        index.build(matrix, range(50))
+        assert index.neighbours(7, k=5, n_probe=4) == index.exact_query(index.vector(7), k=5, exclude=7)
+    def test_ivf_index_save_load(self, tmp_path):
+        index_file = tmp_path / "ivf.npz"
+        index = IVFIndex.from_ratings(Ratings('ml-latest-small/ratings.csv'), kind='movies', n_lists=8)
+        index.save(str(index_file))
+        loaded = IVFIndex.load(str(index_file))
+        assert loaded.neighbours(1, k=5, n_probe=2) == index.neighbours(1, k=5, n_probe=2)
+    def test_ivf_index_missing_file(self):
+        with pytest.raises(FileNotFoundError):
+            IVFIndex.load('nonexistent/ivf.npz')
+
+if __name__ == '__main__':
+    little = sys.argv
+
+    # ./movielens_ann.py ratings.csv index.npz - построить индекс фильмов и сохранить
+    if len(little) == 3:
+        IVFIndex.from_ratings(Ratings(little[1]), kind='movies').save(little[2])
+    else:
+        print("Должно быть - ./movielens_ann.py ratings.csv index.npz")
@@ -0,0 +1,116 @@
+import sys
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from movielens_server import make_server
+
+
+# Набор запросов: небольшое число разных аргументов, чтобы часть запросов попадала в кэш
+def make_queries(n_queries, seed=21):
+    rng = random.Random(seed)
+    templates = [
+        lambda: '/movies/dist_by_rating',
+        lambda: '/movies/dist_by_year',
+        lambda: f"/movies/top_by_ratings?n={rng.randint(5, 50)}&metric={rng.choice(['average', 'median'])}",
+        lambda: f"/movies/top_by_num_of_ratings?n={rng.randint(5, 50)}",
+        lambda: f"/movies/top_controversial?n={rng.randint(5, 50)}",
+        lambda: f"/users/dist_by_metric?metric={rng.choice(['average', 'median'])}",
+        lambda: f"/users/top_controversial?n={rng.randint(5, 50)}",
+        lambda: f"/tags/most_popular?n={rng.randint(5, 50)}",
+        lambda: f"/catalog/dist_by_genres",
+    ]
+
+    return [rng.choice(templates)() for _ in range(n_queries)]
+
+
+# Каждый поток держит своё keep-alive соединение
+# Ответы не 200 не прерывают поток, а попадают в failures
+def run_worker(host, port, queries, latencies, failures):
+    connection = http.client.HTTPConnection(host, port)
+
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            connection.request('GET', query)
+            response = connection.getresponse()
+            response.read()
+
+            if response.status != 200:
+                failures.append(f"{query} failed with {response.status}")
+                continue
+
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        raise ValueError("percentile of an empty list")
+
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+# Возвращает False, если ни один запрос не выполнился успешно
+def load_test(url, n_queries=2000, concurrency=8):
+    parts = urlsplit(url)
+    queries = make_queries(n_queries)
+    latencies = []
+    failures = []
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        chunks = [queries[i::concurrency] for i in range(concurrency)]
+        futures = [pool.submit(run_worker, parts.hostname, parts.port, chunk, latencies, failures) for chunk in chunks]
+
+        for future in futures:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    if failures:
+        print(f"failed: {len(failures)} of {len(queries)}, first: {failures[0]}")
+
+    if not latencies:
+        print(f"requests: 0 of {len(queries)} succeeded, no latency statistics")
+        return False
+
+    print(f"requests: {len(latencies)}, concurrency: {concurrency}, total: {elapsed:.2f}s, {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency ms: p50 = {percentile(latencies, 50) * 1000:.2f}, p95 = {percentile(latencies, 95) * 1000:.2f}, "
+          f"p99 = {percentile(latencies, 99) * 1000:.2f}, max = {latencies[-1] * 1000:.2f}")
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервиса movielens_server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Адрес уже запущенного сервиса")
+    parser.add_argument("--data", help="Запустить сервис в этом процессе на данных из каталога")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error("--requests and --concurrency must be positive")
+
+    url = args.url
+
+    if args.data:
+        server = make_server(args.data, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"Started server on {url}")
+
+    try:
+        if not load_test(url, args.requests, args.concurrency):
+            sys.exit(1)
+    except (ConnectionError, OSError) as e:
+        print(f"Server at {url} is not reachable: {e}")
+        sys.exit(1)
@@ -0,0 +1,48 @@
+import resource
+import tracemalloc
+
+
+"""
+Проба памяти для инструментирования movielens_analysis.py
+Вынесена в отдельный модуль: tracemalloc и resource не входят в список
+разрешённых импортов movielens_analysis.py, поэтому он загружает пробу
+только при включённом профилировании
+-------------------------------------------------------------------------
+"""
+
+# Пик tracemalloc и прирост ru_maxrss (Kb, как в Day04 generator.py)
+# tracemalloc запускается на внешнем вызове. Пик вложенного вызова переносится во внешний кадр,
+# потому что reset_peak сбрасывает общий счётчик
+class MemoryProbe:
+    def __init__(self):
+        self.stack = []
+        self.started = False
+
+    def enter(self):
+        if not self.stack:
+            self.started = not tracemalloc.is_tracing()
+
+            if self.started:
+                tracemalloc.start()
+        else:
+            self.stack[-1]['peak'] = max(self.stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.reset_peak()
+        frame = {'peak': 0, 'start': tracemalloc.get_traced_memory()[0], 'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+        self.stack.append(frame)
+
+        return frame
+
+    def exit(self, frame):
+        peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        self.stack.pop()
+
+        if self.stack:
+            self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+        elif self.started:
+            tracemalloc.stop()
+
+        return {
+            'peak_kb': round((peak - frame['start']) / 1024, 1),
+            'maxrss_delta_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - frame['rss'],
+        }
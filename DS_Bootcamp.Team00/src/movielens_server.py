@@ -0,0 +1,218 @@
+import sys
+import json
+import argparse
+import threading
+import pytest
+import urllib.request
+from urllib.error import HTTPError
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from movielens_analysis import Ratings, Tags, Movies, Links
+
+
+# Доступные методы по ресурсам: /<ресурс>/<метод>?аргументы
+# ratings - Ratings, movies/users - Ratings.movies / Ratings.users, catalog - класс Movies (movies.csv)
+ENDPOINTS = {
+    'ratings': ['similar_movies'],
+    'movies': ['dist_by_year', 'dist_by_rating', 'top_by_num_of_ratings', 'top_by_ratings', 'top_controversial'],
+    'users': ['dist_by_num_of_ratings', 'dist_by_metric', 'top_controversial'],
+    'tags': ['most_words', 'longest', 'most_words_and_longest', 'most_popular', 'tags_with'],
+    'catalog': ['dist_by_release', 'dist_by_genres', 'most_genres'],
+    'links': ['get_imdb', 'top_directors', 'most_expensive', 'most_profitable', 'longest', 'top_cost_per_minute'],
+}
+
+# Целочисленные аргументы. Аргументы list_of_* передаются через запятую, остальные - строки
+INT_ARGS = {'n', 'k'}
+
+
+def parse_arg(name, value):
+    if name in INT_ARGS:
+        return int(value)
+
+    if name.startswith('list_of_'):
+        return tuple(item.strip() for item in value.split(',') if item.strip())
+
+    return value
+
+
+# Загружает все данные один раз и отвечает на запросы из LRU кэша
+class MovieLensService:
+    def __init__(self, data_dir, cache_size=1024, links_cache='imdb_data.json'):
+        self.ratings = Ratings(f'{data_dir}/ratings.csv')
+        self.objects = {
+            'ratings': self.ratings,
+            'movies': self.ratings.movies,
+            'users': self.ratings.users,
+            'tags': Tags(f'{data_dir}/tags.csv'),
+            'catalog': Movies(f'{data_dir}/movies.csv'),
+            'links': Links(f'{data_dir}/links.csv', cache_file=links_cache),
+        }
+
+        # Ratings строит колонки лениво и не рассчитан на параллельные вызовы,
+        # поэтому промахи кэша выполняются по одному
+        self._lock = threading.Lock()
+
+        # Кэшируем уже сериализованный ответ: попадание не тратит время даже на json.dumps
+        self.call = lru_cache(maxsize=cache_size)(self._call)
+
+        self.warm_up()
+
+    # Парсим все колонки и группировки сразу, чтобы первые запросы не читали CSV
+    def warm_up(self):
+        self.ratings._load_columns('userId', 'movieId', 'rating', 'timestamp')
+        self.ratings._grouped('movieId')
+        self.ratings._grouped('userId')
+        self.ratings.movie_titles
+
+    # args - отсортированный кортеж пар (имя, значение), он же ключ кэша
+    def _call(self, resource, method, args):
+        if method not in ENDPOINTS.get(resource, []):
+            raise LookupError(f"Unknown endpoint /{resource}/{method}")
+
+        with self._lock:
+            result = getattr(self.objects[resource], method)(**dict(args))
+
+        return json.dumps(result, ensure_ascii=False).encode('utf-8')
+
+    def index(self):
+        info = self.call.cache_info()
+        cache = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
+
+        return json.dumps({'endpoints': ENDPOINTS, 'cache': cache}).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    # keep-alive: клиент может слать много запросов по одному соединению
+    protocol_version = 'HTTP/1.1'
+
+    # Заголовки и тело пишутся отдельно. С алгоритмом Нейгла каждый ответ ждал бы ~40 мс delayed ACK
+    disable_nagle_algorithm = True
+
+    service = None
+    verbose = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = [part for part in url.path.split('/') if part]
+
+        if not path:
+            return self._send(200, self.service.index())
+
+        if len(path) != 2:
+            return self._send(404, self._error(f"Expected /<resource>/<method>, got {url.path}"))
+
+        try:
+            args = tuple(sorted((name, parse_arg(name, value)) for name, value in parse_qsl(url.query)))
+            body = self.service.call(path[0], path[1], args)
+
+        except LookupError as e:
+            return self._send(404, self._error(str(e)))
+
+        except (TypeError, ValueError) as e:
+            return self._send(400, self._error(str(e)))
+
+        # Любая другая ошибка метода - ответ 500, а не оборванное соединение
+        except Exception as e:
+            self.log_error("Error in %s: %r", url.path, e)
+            return self._send(500, self._error(f"Internal error: {e}"))
+
+        self._send(200, body)
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode('utf-8')
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(data_dir, host='127.0.0.1', port=8000, cache_size=1024, verbose=False):
+    handler = type('MovieLensHandler', (Handler,), {
+        'service': MovieLensService(data_dir, cache_size),
+        'verbose': verbose,
+    })
+
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# Тесты: сервер на свободном порту в фоновом потоке
+@pytest.fixture(scope='module')
+def server_url():
+    server = make_server('ml-latest-small', port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}", server.RequestHandlerClass.service
+
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status, json.loads(response.read())
+
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class Test:
+    def test_index(self, server_url):
+        status, body = fetch(server_url[0] + '/')
+        assert status == 200 and 'movies' in body['endpoints']
+    def test_method(self, server_url):
+        status, body = fetch(server_url[0] + '/movies/dist_by_rating')
+        assert status == 200 and isinstance(body, dict)
+    def test_cached_call(self, server_url):
+        first = fetch(server_url[0] + '/movies/top_by_ratings?n=2&metric=median')
+        assert fetch(server_url[0] + '/movies/top_by_ratings?metric=median&n=2') == first
+        assert server_url[1].call.cache_info().hits >= 1
+    def test_bad_argument(self, server_url):
+        status, body = fetch(server_url[0] + '/movies/top_by_ratings?n=ten')
+        assert status == 400 and 'error' in body
+    def test_unknown_argument(self, server_url):
+        assert fetch(server_url[0] + '/movies/dist_by_rating?x=1')[0] == 400
+    def test_unknown_endpoint(self, server_url):
+        assert fetch(server_url[0] + '/movies/unknown')[0] == 404
+        assert fetch(server_url[0] + '/movies')[0] == 404
+    def test_internal_error(self, server_url, monkeypatch):
+        class Broken:
+            def most_words(self, n):
+                raise RuntimeError('broken')
+        monkeypatch.setitem(server_url[1].objects, 'tags', Broken())
+        status, body = fetch(server_url[0] + '/tags/most_words?n=500')
+        assert status == 500 and 'broken' in body['error']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис аналитики MovieLens")
+    parser.add_argument("--data", default="ml-latest-small", help="Каталог с ratings.csv, tags.csv, movies.csv, links.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=1024, help="Размер LRU кэша ответов")
+    parser.add_argument("--verbose", action="store_true", help="Логировать каждый запрос")
+    args = parser.parse_args()
+
+    try:
+        server = make_server(args.data, args.host, args.port, args.cache_size, args.verbose)
+    except (FileNotFoundError, IOError) as e:
+        print(e)
+        sys.exit(1)
+
+    print(f"Serving on http://{args.host}:{server.server_address[1]}/")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности поиска рецептов
+
+Запуск: python benchmark.py [recipes.csv]
+"""
+
+import sys
+import random
+import timeit
+from recipes import RecipeRecommender
+
+
+def scan_recipes_by_ingredients(recipes_data, ingredients_list):
+    """
+    Прежняя реализация поиска: проход по всем рецептам через iterrows
+
+    Args:
+        recipes_data (pd.DataFrame): Данные о рецептах с колонкой ingredients_list
+        ingredients_list (list): Список ингредиентов для поиска
+
+    Returns:
+        list: Номера рецептов, содержащих все ингредиенты
+    """
+    matching = []
+
+    for position, (_, recipe) in enumerate(recipes_data.iterrows()):
+        recipe_ingredients = [ing.strip().lower() for ing in recipe.get('ingredients_list', '').split(',')]
+
+        if all(ing.lower() in recipe_ingredients for ing in ingredients_list):
+            matching.append(position)
+
+    return matching
+
+
+def make_queries(recommender, n_queries=20, seed=21):
+    """
+    Случайные запросы из 1-3 ингредиентов, встречающихся в рецептах
+
+    Args:
+        recommender (RecipeRecommender): Рекомендатель с построенной матрицей
+        n_queries (int): Количество запросов
+        seed (int): Зерно генератора
+
+    Returns:
+        list: Запросы (списки ингредиентов)
+    """
+    rng = random.Random(seed)
+    counts = recommender.ingredient_matrix.getnnz(axis=0)
+    frequent = [name for name, count in zip(recommender.ingredient_names, counts) if count >= 50 and ',' not in name]
+
+    return [rng.sample(frequent, rng.randint(1, 3)) for _ in range(n_queries)]
+
+
+def bench_get_recipe_by_ingredients(recommender, queries):
+    """
+    Сравнение прохода по всем рецептам с инвертированным индексом
+
+    Args:
+        recommender (RecipeRecommender): Рекомендатель с построенной матрицей
+        queries (list): Запросы (списки ингредиентов)
+    """
+    recommender._ensure_ingredients_list()
+    data = recommender.recipes_data
+
+    build_time = timeit.timeit(recommender._get_ingredient_index, number=1)
+    print(f"Построение индекса: {build_time * 1000:.1f} мс")
+
+    for query in queries:
+        expected = scan_recipes_by_ingredients(data, query)
+        found = recommender.find_recipe_ids(all_of=query).tolist()
+
+        if expected != found:
+            raise AssertionError(f"Результаты отличаются для {query}")
+
+    scan_time = timeit.timeit(lambda: [scan_recipes_by_ingredients(data, q) for q in queries], number=1)
+    index_time = timeit.timeit(lambda: [recommender.find_recipe_ids(all_of=q) for q in queries], number=10) / 10
+    any_time = timeit.timeit(lambda: [recommender.find_recipe_ids(any_of=q) for q in queries], number=10) / 10
+
+    print(f"iterrows, все из:     {scan_time / len(queries) * 1000:.3f} мс/запрос")
+    print(f"индекс, все из:       {index_time / len(queries) * 1000:.3f} мс/запрос")
+    print(f"индекс, любой из:     {any_time / len(queries) * 1000:.3f} мс/запрос")
+
+
+if __name__ == "__main__":
+    recipes_file = sys.argv[1] if len(sys.argv) > 1 else "recipes.csv"
+
+    recommender = RecipeRecommender(recipes_file)
+    if recommender.ingredient_matrix is None:
+        sys.exit(1)
+
+    bench_get_recipe_by_ingredients(recommender, make_queries(recommender))
@@ -1,89 +1,164 @@
+import os
+import sys
+import json
 import argparse
-import pickle
-import pandas as pd
-from recipes import NutritionFacts, RecipeRecommender, DailyMenuGenerator
+from contextlib import redirect_stdout
 
-def load_model(model_path):
+# pandas, sklearn и recipes импортируются только после разбора аргументов:
+# --help и ошибки в аргументах не должны ждать загрузки тяжелых модулей
+
+def model_file():
     """
-    Загружает обученную модель из файла
+    Файл модели прогноза рейтинга
+    
+    Returns:
+        str: Упакованная модель best_model.npz, если она есть, иначе best_model.pkl
+    """
+    return "best_model.npz" if os.path.exists("best_model.npz") else "best_model.pkl"
+
+def parse_ingredients(line):
+    """
+    Разбор строки ингредиентов через запятую
     
     Args:
-        model_path (str): Путь к файлу модели
+        line (str): Ингредиенты через запятую
         
     Returns:
-        object: Загруженная модель или None в случае ошибки
+        list: Ингредиенты без лишних пробелов (пустые отброшены)
     """
-    try:
-        with open(model_path, "rb") as file:
-            model = pickle.load(file)
-        print(f"Модель успешно загружена из {model_path}")
-        return model
-    except FileNotFoundError:
-        print(f"Файл модели не найден: {model_path}")
-        return None
-    except Exception as e:
-        print(f"Ошибка загрузки модели: {e}")
-        return None
+    return [ingredient.strip() for ingredient in line.split(",") if ingredient.strip()]
 
-def forecast_rating(model, ingredients):
+def to_json_value(value):
     """
-    Прогнозирует рейтинг блюда на основе ингредиентов
+    Приведение значения pandas/numpy к типу, который можно записать в JSON
     
     Args:
-        model: Обученная модель машинного обучения (может быть None)
-        ingredients (list): Список ингредиентов
+        value: Значение из DataFrame
         
     Returns:
-        str: Прогнозируемый класс рейтинга (bad, so-so, great)
-        
-    Raises:
-        SystemExit: Если происходит ошибка во время прогнозирования
+        object: Число, строка или None для пропусков
     """
-    try:
-        # Если модель не загружена, используем простую логику
-        if model is None:
-            print("Модель не загружена, использую простую логику оценки")
-            
-            # Простая логика оценки на основе ключевых слов
-            ingredients_str = ", ".join(ingredients).lower()
-            
-            # Определяем рейтинг по ключевым словам
-            bad_keywords = ['rotten', 'spoiled', 'artificial', 'processed', 'old', 'stale']
-            great_keywords = ['fresh', 'organic', 'natural', 'chocolate', 'honey', 'fruits']
-            
-            bad_count = sum(1 for word in bad_keywords if word in ingredients_str)
-            great_count = sum(1 for word in great_keywords if word in ingredients_str)
-            
-            if bad_count > great_count:
-                return "bad"
-            elif great_count > bad_count:
-                return "great"
-            else:
-                return "so-so"
+    import pandas as pd
+    
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+def resolve_ingredients(resolver, ingredients):
+    """
+    Замена ингредиентов с опечатками на известные названия
+    
+    Args:
+        resolver (IngredientResolver): Резолвер названий (None - без замены)
+        ingredients (list): Ингредиенты из запроса
         
-        # Если модель загружена, используем её для прогнозирования
-        ingredients_str = ", ".join(ingredients)
+    Returns:
+        list: Известные названия (нераспознанные ингредиенты остаются как есть)
+    """
+    if resolver is None:
+        return list(ingredients)
+    
+    return [resolved or ingredient for ingredient, resolved in zip(ingredients, resolver.resolve_many(ingredients))]
+
+def answer_batch(queries, nutrition, recommender, forecaster, top_n=3, resolver=None):
+    """
+    Ответы на пачку запросов: прогноз, пищевая ценность и похожие рецепты
+    
+    Пищевая ценность ищется одним запросом get_many для всех ингредиентов пачки,
+    похожие рецепты - одним произведением матриц find_similar_recipes_batch.
+    
+    Args:
+        queries (list): Списки ингредиентов
+        nutrition (NutritionFacts): Данные о питании
+        recommender (RecipeRecommender): Рекомендатель рецептов
+        forecaster (RatingForecaster): Прогноз рейтинга
+        top_n (int): Количество похожих рецептов на запрос
+        resolver (IngredientResolver): Резолвер названий ингредиентов
         
-        # В реальном случае здесь должна быть предобработка данных
-        # как при обучении модели. Для простоты предполагаем, что модель
-        # использует CountVectorizer на тексте ингредиентов
-        prediction = model.predict([ingredients_str])[0]
+    Returns:
+        list: Словарь с ответом для каждого запроса
+    """
+    transformed_data = nutrition.transform_data()
+    originals = queries
+    queries = [resolve_ingredients(resolver, query) for query in originals]
+    forecasts = forecaster.predict_many(queries)
+    
+    # Пищевая ценность всех различных ингредиентов пачки
+    facts = {}
+    if nutrition.ingredient_column is not None and not transformed_data.empty:
+        names = sorted({ingredient.lower() for query in queries for ingredient in query})
+        rows = nutrition.get_many(names, transformed_data).drop(columns=[nutrition.ingredient_column])
         
-        # Преобразуем числовой прогноз в категории, если нужно
-        if isinstance(prediction, (int, float)):
-            if prediction <= 1:
-                return "bad"
-            elif prediction <= 3:
-                return "so-so"
-            else:
-                return "great"
+        for name, (_, row) in zip(names, rows.iterrows()):
+            if row.notna().any():
+                facts[name] = {col: to_json_value(value) for col, value in row.items()}
+    
+    # Похожие рецепты для всех запросов сразу
+    similar = {}
+    results = recommender.find_similar_recipes_batch(queries, top_n)
+    for query_id, group in (results.groupby('query') if not results.empty else []):
+        similar[query_id] = [
+            {col: to_json_value(value) for col, value in row.items()}
+            for _, row in group.drop(columns=['query']).iterrows()
+        ]
+    
+    return [
+        {
+            "ingredients": original,
+            "resolved": dict(zip(original, query)),
+            "forecast": forecasts[query_id],
+            "nutrition": {ingredient: facts.get(name.lower()) for ingredient, name in zip(original, query)},
+            "similar_recipes": similar.get(query_id, []),
+        }
+        for query_id, (original, query) in enumerate(zip(originals, queries))
+    ]
+
+def run_batch(lines, output, batch_size=256):
+    """
+    Пакетный режим: один список ингредиентов на строку, ответ - строка JSON
+    
+    Данные и модель загружаются один раз, запросы обрабатываются пачками
+    по batch_size строк. Служебные сообщения выводятся в stderr,
+    чтобы в output были только строки JSON.
+    
+    Args:
+        lines: Итератор строк (файл или sys.stdin)
+        output: Поток для ответов
+        batch_size (int): Размер пачки запросов
+    """
+    from recipes import RecipeRecommender, RatingForecaster, IngredientResolver, get_nutrition_facts
+    
+    with redirect_stdout(sys.stderr):
+        nutrition = get_nutrition_facts("nutrition_facts.csv", "daily_values.csv")
+        recommender = RecipeRecommender("recipes.csv")
+        forecaster = RatingForecaster.load(model_file(), recommender.ingredient_names)
+        resolver = IngredientResolver.from_sources(nutrition, recommender)
+    
+    def flush(queries):
+        with redirect_stdout(sys.stderr):
+            answers = answer_batch(queries, nutrition, recommender, forecaster, resolver=resolver)
         
-        return prediction
+        for answer in answers:
+            output.write(json.dumps(answer, ensure_ascii=False) + "\n")
+        output.flush()
+    
+    queries = []
+    for line in lines:
+        query = parse_ingredients(line)
+        if not query:
+            continue
         
-    except Exception as e:
-        print(f"Ошибка во время прогнозирования: {e}")
-        # В случае ошибки возвращаем средний рейтинг
-        return "so-so"
+        queries.append(query)
+        if len(queries) >= batch_size:
+            flush(queries)
+            queries = []
+    
+    if queries:
+        flush(queries)
+    
+    print(f"Статистика прогнозов: {forecaster.stats()}", file=sys.stderr)
 
 def main():
     """
@@ -97,12 +172,43 @@ def main():
     parser = argparse.ArgumentParser(description="Предиктор здоровой и вкусной еды.")
     parser.add_argument("ingredients", type=str, nargs='?', help="Список ингредиентов через запятую")
     parser.add_argument("--menu", action="store_true", help="Сгенерировать дневное меню")
+    parser.add_argument("--days", type=int, default=1, help="Количество дней меню без повторов блюд (с --menu)")
+    parser.add_argument("--batch", metavar="FILE", help="Файл со списками ингредиентов (по одному на строку), ответы - JSON lines")
+    parser.add_argument("--stdin", action="store_true", help="Читать списки ингредиентов из stdin, ответы - JSON lines")
+    parser.add_argument("--batch-size", type=int, default=256, help="Размер пачки запросов в режимах --batch/--stdin")
     args = parser.parse_args()
 
+    # Пакетные режимы: все загружается один раз на весь поток запросов
+    if args.batch:
+        try:
+            with open(args.batch, "r", encoding="utf-8") as file:
+                run_batch(file, sys.stdout, args.batch_size)
+        except FileNotFoundError:
+            print(f"Файл не найден: {args.batch}", file=sys.stderr)
+            exit(1)
+        return
+
+    if args.stdin:
+        run_batch(sys.stdin, sys.stdout, args.batch_size)
+        return
+
     # Если запрошено меню, генерируем его
     if args.menu:
+        from recipes import DailyMenuGenerator
+        
         print("Генерация дневного меню...")
         menu_generator = DailyMenuGenerator("recipes.csv", "nutrition_facts.csv", "daily_values.csv")
+        
+        # Меню на несколько дней подбирается планировщиком
+        if args.days > 1:
+            plan = menu_generator.plan_menu(days=args.days)
+            
+            if plan:
+                menu_generator.display_menu_plan(plan)
+            else:
+                print("Не удалось сгенерировать меню")
+            return
+        
         daily_menu = menu_generator.generate_daily_menu()
         
         if daily_menu:
@@ -121,17 +227,29 @@ def main():
         return
 
     # Подготавливаем список ингредиентов, убирая лишние пробелы
-    ingredients_list = [ingredient.strip() for ingredient in args.ingredients.split(",")]
+    ingredients_list = parse_ingredients(args.ingredients)
 
     # Загружаем необходимые модули и данные
     print("Загрузка данных...")
-    nutrition = NutritionFacts("nutrition_facts.csv", "daily_values.csv")
+    from recipes import RecipeRecommender, RatingForecaster, IngredientResolver, get_nutrition_facts
+    
+    nutrition = get_nutrition_facts("nutrition_facts.csv", "daily_values.csv")
     recommender = RecipeRecommender("recipes.csv")
-    model = load_model("best_model.pkl")
+    forecaster = RatingForecaster.load(model_file(), recommender.ingredient_names)
+
+    # Сопоставляем ингредиенты с опечатками с известными названиями
+    # Сообщаем только о настоящих заменах: нераспознанные ингредиенты остаются как есть
+    resolver = IngredientResolver.from_sources(nutrition, recommender)
+    matches = resolver.resolve_many(ingredients_list)
+    resolved_list = [match or ingredient for ingredient, match in zip(ingredients_list, matches)]
+    
+    for ingredient, match in zip(ingredients_list, matches):
+        if match is not None and match != resolver.normalize(ingredient):
+            print(f"'{ingredient}' распознан как '{match}'")
 
     # Прогнозируем рейтинг блюда
     print("\nI. НАШ ПРОГНОЗ")
-    predicted_class = forecast_rating(model, ingredients_list)
+    predicted_class = forecaster.predict(resolved_list)
     
     # Выводим результат прогноза на русском языке
     if predicted_class == "bad":
@@ -151,35 +269,29 @@ def main():
 
     # Отображаем информацию о пищевой ценности
     print("\nII. ПИЩЕВАЯ ЦЕННОСТЬ")
-    for ingredient in ingredients_list:
-        print(f"\n{ingredient.capitalize()}:")
-        
-        # Ищем колонку с названием ингредиента (нечувствительно к регистру)
-        ingredient_col = None
-        for col in transformed_data.columns:
-            if col.lower() == 'ingredient':
-                ingredient_col = col
-                break
-        
-        if ingredient_col is None:
-            print("  Колонка с названиями ингредиентов не найдена в данных")
-            continue
-        
-        # Ищем данные о питании для ингредиента
-        facts = transformed_data[transformed_data[ingredient_col].str.lower() == ingredient.lower()]
+    if nutrition.ingredient_column is None:
+        print("Колонка с названиями ингредиентов не найдена в данных")
+    else:
+        # Данные о питании для всех ингредиентов одним запросом к индексу
+        all_facts = nutrition.get_many(resolved_list, transformed_data)
         
-        if facts.empty:
-            print("  Данные о питании недоступны.")
-        else:
-            # Убираем колонку с названием ингредиента и показываем остальные данные
-            nutrition_info = facts.drop(columns=[ingredient_col])
-            print(nutrition_info.to_string(index=False))
+        for position, ingredient in enumerate(ingredients_list):
+            print(f"\n{ingredient.capitalize()}:")
+            
+            facts = all_facts.iloc[[position]]
+            
+            if facts[nutrition.ingredient_column].isna().all():
+                print("  Данные о питании недоступны.")
+            else:
+                # Убираем колонку с названием ингредиента и показываем остальные данные
+                nutrition_info = facts.drop(columns=[nutrition.ingredient_column])
+                print(nutrition_info.to_string(index=False))
 
     # Находим и отображаем похожие рецепты
     print("\nIII. ТОП-3 ПОХОЖИХ РЕЦЕПТА:")
     try:
         # Ищем похожие рецепты на основе ингредиентов
-        similar_recipes = recommender.find_similar_recipes(", ".join(ingredients_list))
+        similar_recipes = recommender.find_similar_recipes(", ".join(resolved_list))
         
         if similar_recipes.empty:
             print("Похожие рецепты не найдены.")
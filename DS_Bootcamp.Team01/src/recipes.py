@@ -4,12 +4,210 @@
 Содержит классы для работы с данными о питании и рекомендациями рецептов
 """
 
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+from collections import Counter
+import re
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import CountVectorizer
-import requests
-import re
+from scipy import sparse
+
+# sklearn импортируется внутри методов, которые его используют: импорт занимает
+# больше секунды и не нужен, например, для меню или данных о питании
+
+
+def split_ingredients(text):
+    """
+    Разбиение строки ингредиентов через запятую на отдельные ингредиенты
+    
+    Args:
+        text (str): Ингредиенты через запятую
+        
+    Returns:
+        list: Ингредиенты без лишних пробелов
+    """
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+
+def file_hash(path):
+    """
+    SHA-256 содержимого файла
+    
+    Args:
+        path (str): Путь к файлу
+        
+    Returns:
+        str: Шестнадцатеричный хэш
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Колонки рецептов, которые не являются бинарными признаками ингредиентов
+NON_INGREDIENT_COLUMNS = [
+    'rating', 'title', 'calories', 'protein', 'fat', 'sodium', 'url', 'epicurious_url',
+    'ingredients_list', 'meal_time', 'nutrition_score', 'total_score'
+]
+
+# Явные типы небинарных колонок файла рецептов, остальные колонки - индикаторы ингредиентов
+RECIPE_COLUMN_DTYPES = {
+    'rating': 'float64', 'calories': 'float64', 'protein': 'float64', 'fat': 'float64', 'sodium': 'float64',
+    'title': 'str', 'url': 'str', 'epicurious_url': 'str'
+}
+
+
+def ingredient_columns(recipes_data):
+    """
+    Бинарные (0/1) колонки ингредиентов в данных о рецептах
+    
+    Args:
+        recipes_data (pd.DataFrame): Данные о рецептах
+        
+    Returns:
+        list: Названия колонок ингредиентов
+    """
+    return [col for col in recipes_data.columns 
+            if col not in NON_INGREDIENT_COLUMNS and pd.api.types.is_numeric_dtype(recipes_data[col])]
+
+
+def build_ingredient_matrix(recipes_data):
+    """
+    Разреженная матрица рецепт x ингредиент прямо из бинарных колонок
+    
+    Матрица собирается по колонкам, без плотной копии всей таблицы
+    и без промежуточных строк с ингредиентами через запятую.
+    
+    Args:
+        recipes_data (pd.DataFrame): Данные о рецептах
+        
+    Returns:
+        tuple: (csr_matrix рецепты x ингредиенты, список названий ингредиентов)
+    """
+    columns = ingredient_columns(recipes_data)
+    rows = []
+    cols = []
+    
+    for index, col in enumerate(columns):
+        recipe_ids = np.flatnonzero(recipes_data[col].to_numpy() == 1)
+        rows.append(recipe_ids)
+        cols.append(np.full(len(recipe_ids), index))
+    
+    rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+    
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(recipes_data), len(columns))
+    )
+    matrix.sort_indices()
+    
+    return matrix, columns
+
+
+def ingredient_tokens(ingredient_names):
+    """
+    Токены запросов для колонок матрицы ингредиентов
+    
+    Разбиение то же, что у CountVectorizer по строкам ингредиентов через
+    запятую: название в нижнем регистре делится по запятым, поэтому колонка
+    'washington, d.c.' дает токены 'washington' и 'd.c.', а колонки,
+    совпадающие без учета регистра, дают один токен.
+    
+    Args:
+        ingredient_names (list): Названия колонок матрицы ингредиентов
+        
+    Returns:
+        tuple: (csr_matrix колонки x токены с числом вхождений, отсортированный список токенов)
+    """
+    column_tokens = [split_ingredients(name.lower()) for name in ingredient_names]
+    tokens = sorted({token for names in column_tokens for token in names})
+    token_index = {token: index for index, token in enumerate(tokens)}
+    
+    rows = [column for column, names in enumerate(column_tokens) for _ in names]
+    cols = [token_index[token] for names in column_tokens for token in names]
+    
+    token_map = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(ingredient_names), len(tokens))
+    )
+    
+    return token_map, tokens
+
+
+def ingredient_strings(ingredient_matrix, ingredient_names):
+    """
+    Ингредиенты каждого рецепта строкой через запятую (для отображения)
+    
+    Args:
+        ingredient_matrix (csr_matrix): Матрица рецепт x ингредиент
+        ingredient_names (list): Названия колонок матрицы
+        
+    Returns:
+        list: Строка ингредиентов для каждого рецепта
+    """
+    names = np.asarray(ingredient_names, dtype=object)
+    indptr = ingredient_matrix.indptr
+    indices = ingredient_matrix.indices
+    
+    return [', '.join(names[indices[start:end]]) for start, end in zip(indptr[:-1], indptr[1:])]
+
+
+_recipes_cache = {}
+
+
+def load_recipes(recipes_file, indicator_dtype='uint8'):
+    """
+    Общая для всех классов загрузка файла рецептов с компактными типами
+    
+    Бинарные колонки ингредиентов читаются как uint8 (или разреженные),
+    а не float64, остальные колонки - с типами из RECIPE_COLUMN_DTYPES.
+    Таблица читается один раз на процесс и перечитывается, только если
+    файл изменился. Каждый вызов возвращает поверхностную копию, поэтому
+    колонки, добавленные одним классом, не видны другим.
+    
+    Args:
+        recipes_file (str): Путь к файлу с рецептами
+        indicator_dtype (str): 'uint8' или 'sparse' (pd.SparseDtype uint8)
+        
+    Returns:
+        pd.DataFrame: Данные о рецептах
+    """
+    key = (os.path.abspath(recipes_file), indicator_dtype)
+    stat = os.stat(recipes_file)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    
+    cached = _recipes_cache.get(key)
+    if cached is None or cached[0] != signature:
+        header = pd.read_csv(recipes_file, nrows=0).columns
+        dtypes = {col: RECIPE_COLUMN_DTYPES.get(col, 'uint8') for col in header
+                  if col not in NON_INGREDIENT_COLUMNS or col in RECIPE_COLUMN_DTYPES}
+        
+        try:
+            recipes_data = pd.read_csv(recipes_file, dtype=dtypes)
+        except ValueError:
+            # Пропуски или не 0/1 в колонках ингредиентов - читаем их как есть
+            print("Предупреждение: колонки ингредиентов не бинарные, загрузка без uint8")
+            recipes_data = pd.read_csv(recipes_file, dtype={
+                col: dtype for col, dtype in dtypes.items() if col in RECIPE_COLUMN_DTYPES
+            })
+        
+        if indicator_dtype == 'sparse':
+            sparse_dtype = pd.SparseDtype(np.uint8, 0)
+            recipes_data = recipes_data.astype({
+                col: sparse_dtype for col in ingredient_columns(recipes_data)
+                if recipes_data[col].dtype == np.uint8
+            })
+        
+        _recipes_cache[key] = (signature, recipes_data)
+    
+    return _recipes_cache[key][1].copy(deep=False)
 
 
 class NutritionFacts:
@@ -27,7 +225,48 @@ class NutritionFacts:
         self.daily_values_file = daily_values_file
         self.nutrition_data = None
         self.daily_values = None
+        self.ingredient_column = None
+        self._ingredient_rows = {}
+        self.nutrient_columns = []
+        self.nutrient_column_index = {}
+        self.nutrient_daily_values = None
+        self._daily_value_matrix = None
+        self._transformed = None
+        self._inputs = self._inputs_signature()
         self._load_data()
+        self._build_ingredient_index()
+    
+    def _inputs_signature(self):
+        """
+        Отпечаток входных файлов (время изменения и размер)
+        
+        Returns:
+            tuple: Отпечаток файла с данными о питании и файла с дневными нормами
+        """
+        signature = []
+        for path in (self.nutrition_file, self.daily_values_file):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _reload_if_changed(self):
+        """
+        Перезагрузка данных и сброс вычисленных таблиц, если входные файлы изменились
+        """
+        signature = self._inputs_signature()
+        
+        if signature != self._inputs:
+            self._inputs = signature
+            self.ingredient_column = None
+            self._ingredient_rows = {}
+            self.nutrient_daily_values = None
+            self._daily_value_matrix = None
+            self._transformed = None
+            self._load_data()
+            self._build_ingredient_index()
     
     def _load_data(self):
         """
@@ -54,47 +293,165 @@ class NutritionFacts:
             self.nutrition_data = pd.DataFrame()
             self.daily_values = pd.DataFrame()
     
+    @staticmethod
+    def normalize_name(ingredient_name):
+        """
+        Нормализация названия ингредиента для поиска
+        
+        Args:
+            ingredient_name (str): Название ингредиента
+            
+        Returns:
+            str: Название без лишних пробелов в нижнем регистре
+        """
+        return str(ingredient_name).strip().lower()
+    
+    def _build_ingredient_index(self):
+        """
+        Построение индекса: нормализованное название ингредиента -> номер строки
+        
+        Колонка с названиями ищется один раз (нечувствительно к регистру).
+        При повторах названия используется первая строка.
+        """
+        for col in self.nutrition_data.columns:
+            if col.lower() == 'ingredient':
+                self.ingredient_column = col
+                break
+        
+        if self.ingredient_column is None:
+            return
+        
+        for position, name in enumerate(self.nutrition_data[self.ingredient_column]):
+            if pd.notna(name):
+                self._ingredient_rows.setdefault(self.normalize_name(name), position)
+    
+    def row_positions(self, ingredient_names):
+        """
+        Номера строк nutrition_data для названий ингредиентов
+        
+        Args:
+            ingredient_names (list): Названия ингредиентов
+            
+        Returns:
+            np.ndarray: Номер строки для каждого названия, -1 для неизвестных
+        """
+        return np.array(
+            [self._ingredient_rows.get(self.normalize_name(name), -1) for name in ingredient_names],
+            dtype=np.int64
+        )
+    
+    def get_many(self, ingredient_names, data=None):
+        """
+        Данные о питании сразу для нескольких ингредиентов
+        
+        Args:
+            ingredient_names (list): Названия ингредиентов
+            data (pd.DataFrame): Таблица с теми же строками, что и nutrition_data
+                (например, результат transform_data). По умолчанию nutrition_data
+            
+        Returns:
+            pd.DataFrame: Строка для каждого запрошенного названия в том же порядке,
+                индекс - запрошенные названия. Для неизвестных ингредиентов строка из NaN
+        """
+        if data is None:
+            data = self.nutrition_data
+        
+        positions = self.row_positions(ingredient_names)
+        
+        # У data индекс 0..n-1, поэтому -1 дает строку из NaN
+        result = data.reset_index(drop=True).reindex(positions)
+        result.index = list(ingredient_names)
+        
+        return result
+    
+    def _percent_of_daily_values(self):
+        """
+        Проценты от дневной нормы одним делением с выравниванием по названиям
+        
+        Returns:
+            np.ndarray: Матрица float64 (строки nutrition_data, колонки nutrient_columns)
+        """
+        # Названия питательных веществ без лишних пробелов, self.daily_values не меняется
+        daily_values = self.daily_values.assign(nutrient=self.daily_values['nutrient'].str.strip())
+        daily_values = daily_values.drop_duplicates('nutrient').set_index('nutrient')['daily_value']
+        
+        self.nutrient_columns = [col for col in self.nutrition_data.columns if col in daily_values.index]
+        self.nutrient_column_index = {col: index for index, col in enumerate(self.nutrient_columns)}
+        
+        # Заменяем NaN на 0 для корректных вычислений
+        values = self.nutrition_data[self.nutrient_columns].fillna(0).to_numpy(dtype=np.float64)
+        daily = daily_values[self.nutrient_columns].to_numpy(dtype=np.float64)
+        self.nutrient_daily_values = daily
+        
+        return values / daily * 100
+    
     def transform_data(self):
         """
         Трансформация данных о питании в проценты от дневной нормы
         
         Преобразует абсолютные значения питательных веществ в проценты
-        от рекомендуемой дневной нормы потребления.
+        от рекомендуемой дневной нормы потребления. Результат запоминается
+        до изменения входных файлов, а вызывающему возвращается копия,
+        поэтому её можно изменять.
         
         Returns:
             pd.DataFrame: Трансформированные данные с процентами от дневной нормы
         """
+        return self._get_transformed().copy()
+    
+    def _get_transformed(self):
+        """
+        Запомненный результат transform_data без копирования (только для чтения)
+        
+        Returns:
+            pd.DataFrame: Трансформированные данные или пустой DataFrame
+        """
+        self._reload_if_changed()
+        
         if self.nutrition_data.empty or self.daily_values.empty:
             print("Нет данных для трансформации")
             return pd.DataFrame()
         
         try:
-            # Очищаем названия питательных веществ от лишних пробелов
-            self.daily_values['nutrient'] = self.daily_values['nutrient'].str.strip()
-            
-            # Создаем копию данных для работы
-            transformed = self.nutrition_data.copy()
-            
-            # Преобразуем каждое питательное вещество в проценты от дневной нормы
-            for _, nutrient_row in self.daily_values.iterrows():
-                nutrient_name = nutrient_row['nutrient']
-                daily_value = nutrient_row['daily_value']
+            if self._transformed is None:
+                percent = self._percent_of_daily_values()
                 
-                # Проверяем, есть ли колонка с этим питательным веществом
-                if nutrient_name in transformed.columns:
-                    # Заменяем NaN на 0 для корректных вычислений
-                    transformed[nutrient_name] = transformed[nutrient_name].fillna(0)
-                    
-                    # Вычисляем процент от дневной нормы
-                    transformed[nutrient_name] = (transformed[nutrient_name] / daily_value) * 100
+                # Заменяем колонки питательных веществ процентами от дневной нормы
+                transformed = self.nutrition_data.copy()
+                transformed[self.nutrient_columns] = percent
+                
+                self._transformed = transformed
+                print("Данные о питании успешно трансформированы")
             
-            print("Данные о питании успешно трансформированы")
-            return transformed
+            return self._transformed
             
         except Exception as e:
             print(f"Ошибка трансформации данных: {e}")
             return pd.DataFrame()
     
+    def get_daily_value_matrix(self):
+        """
+        Матрица ингредиент x питательное вещество в процентах от дневной нормы
+        
+        Строки совпадают со строками nutrition_data, колонки - nutrient_columns
+        (номер колонки по названию - nutrient_column_index). Запоминается
+        вместе с transform_data до изменения входных файлов, поэтому
+        доступна только для чтения.
+        
+        Returns:
+            np.ndarray: Матрица float32 или None, если данных нет
+        """
+        transformed = self._get_transformed()
+        
+        if transformed.empty:
+            return None
+        
+        if self._daily_value_matrix is None:
+            self._daily_value_matrix = transformed[self.nutrient_columns].to_numpy(dtype=np.float32)
+            self._daily_value_matrix.flags.writeable = False
+        
+        return self._daily_value_matrix
+    
     def get_ingredient_nutrition(self, ingredient_name):
         """
         Получение данных о питании для конкретного ингредиента
@@ -109,48 +466,74 @@ class NutritionFacts:
             return {}
         
         try:
-            # Ищем колонку с названием ингредиента (нечувствительно к регистру)
-            ingredient_col = None
-            for col in self.nutrition_data.columns:
-                if col.lower() == 'ingredient':
-                    ingredient_col = col
-                    break
-            
-            if ingredient_col is None:
+            if self.ingredient_column is None:
                 print("Колонка с названиями ингредиентов не найдена")
                 return {}
             
             # Ищем ингредиент без учета регистра
-            ingredient_data = self.nutrition_data[
-                self.nutrition_data[ingredient_col].str.lower() == ingredient_name.lower()
-            ]
+            position = self._ingredient_rows.get(self.normalize_name(ingredient_name))
             
-            if ingredient_data.empty:
+            if position is None:
                 print(f"Ингредиент '{ingredient_name}' не найден в базе данных")
                 return {}
             
             # Возвращаем данные первого найденного ингредиента
-            return ingredient_data.iloc[0].to_dict()
+            return self.nutrition_data.iloc[position].to_dict()
             
         except Exception as e:
             print(f"Ошибка поиска ингредиента '{ingredient_name}': {e}")
             return {}
 
 
+# Общие экземпляры NutritionFacts: (файл питания, файл дневных норм) -> NutritionFacts
+_nutrition_facts_cache = {}
+
+
+def get_nutrition_facts(nutrition_file, daily_values_file):
+    """
+    Общий экземпляр NutritionFacts для пары файлов
+    
+    nutritionist.py и DailyMenuGenerator используют один и тот же объект,
+    поэтому таблица процентов от дневной нормы считается один раз.
+    
+    Args:
+        nutrition_file (str): Путь к файлу с данными о питании
+        daily_values_file (str): Путь к файлу с дневными нормами
+        
+    Returns:
+        NutritionFacts: Данные о питании
+    """
+    key = (os.path.abspath(nutrition_file), os.path.abspath(daily_values_file))
+    
+    if key not in _nutrition_facts_cache:
+        _nutrition_facts_cache[key] = NutritionFacts(nutrition_file, daily_values_file)
+    
+    return _nutrition_facts_cache[key]
+
+
 class RecipeRecommender:
     """Класс для рекомендации похожих рецептов"""
     
-    def __init__(self, recipes_file):
+    def __init__(self, recipes_file, use_cache=True):
         """
         Инициализация класса
         
         Args:
             recipes_file (str): Путь к файлу с рецептами
+            use_cache (bool): Загружать словарь и матрицу ингредиентов из кэша рядом с файлом рецептов
         """
         self.recipes_file = recipes_file
+        self.use_cache = use_cache
+        cache_base = os.path.splitext(recipes_file)[0]
+        self.matrix_cache_file = cache_base + ".ingredients.npz"
+        self.vocabulary_cache_file = cache_base + ".vocabulary.json"
         self.recipes_data = None
         self.vectorizer = None
         self.ingredient_matrix = None
+        self.ingredient_names = None
+        self._normalized_matrix_t = None
+        self._token_map = None
+        self._ingredient_index = None
         self._load_data()
         self._prepare_similarity_matrix()
     
@@ -162,7 +545,7 @@ class RecipeRecommender:
         при загрузке файла.
         """
         try:
-            self.recipes_data = pd.read_csv(self.recipes_file)
+            self.recipes_data = load_recipes(self.recipes_file)
             print(f"Рецепты загружены: {len(self.recipes_data)} записей")
             
             # Проверяем наличие необходимых колонок
@@ -179,48 +562,157 @@ class RecipeRecommender:
             print(f"Ошибка загрузки рецептов: {e}")
             self.recipes_data = pd.DataFrame()
     
+    def _ensure_ingredients_list(self):
+        """
+        Создание колонки ingredients_list из матрицы ингредиентов, если её нет
+        
+        Колонка нужна только для отображения и поиска по строкам,
+        поэтому строится лениво при первом обращении.
+        """
+        if 'ingredients_list' not in self.recipes_data.columns and self.ingredient_matrix is not None:
+            self.recipes_data['ingredients_list'] = ingredient_strings(
+                self.ingredient_matrix, self.ingredient_names
+            )
+    
+    def _make_vectorizer(self, ingredient_names, ingredient_matrix):
+        """
+        Создание CountVectorizer с заранее заданным словарем токенов
+        
+        Словарь - токены колонок матрицы ингредиентов (см. ingredient_tokens),
+        которые встречаются хотя бы в одном рецепте, как у CountVectorizer,
+        обученного на строках ингредиентов. Векторизатор не нужно обучать:
+        запрос переводится в те же токены, что и рецепты.
+        
+        Args:
+            ingredient_names (list): Названия колонок матрицы ингредиентов
+            ingredient_matrix (csr_matrix): Матрица рецепт x ингредиент
+            
+        Returns:
+            tuple: (CountVectorizer, csr_matrix колонки x токены словаря)
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+        
+        token_map, tokens = ingredient_tokens(ingredient_names)
+        
+        used_columns = ingredient_matrix.getnnz(axis=0) > 0
+        used_tokens = np.flatnonzero(token_map[used_columns].getnnz(axis=0) > 0)
+        
+        vectorizer = CountVectorizer(
+            tokenizer=split_ingredients,
+            lowercase=True,
+            vocabulary={tokens[token]: index for index, token in enumerate(used_tokens)}
+        )
+        
+        return vectorizer, token_map[:, used_tokens]
+    
+    def _load_cached_matrix(self, source_hash):
+        """
+        Загрузка словаря и матрицы ингредиентов из кэша
+        
+        Кэш используется, только если он построен по файлу рецептов
+        с тем же хэшем содержимого.
+        
+        Args:
+            source_hash (str): Хэш текущего файла рецептов
+            
+        Returns:
+            bool: True, если кэш подошел и загружен
+        """
+        try:
+            with open(self.vocabulary_cache_file, "r", encoding="utf-8") as file:
+                cached = json.load(file)
+            
+            if cached.get("source_hash") != source_hash or "ingredients" not in cached:
+                print("Файл рецептов изменился, кэш матрицы будет перестроен")
+                return False
+            
+            matrix = sparse.load_npz(self.matrix_cache_file).tocsr()
+            
+            if matrix.shape != (len(self.recipes_data), len(cached["ingredients"])):
+                return False
+            
+            self.ingredient_names = cached["ingredients"]
+            self.ingredient_matrix = matrix
+            self.vectorizer, self._token_map = self._make_vectorizer(self.ingredient_names, matrix)
+            
+            print(f"Матрица сходства загружена из кэша: {self.ingredient_matrix.shape}")
+            return True
+            
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Ошибка чтения кэша матрицы сходства: {e}")
+            return False
+    
+    def _save_cached_matrix(self, source_hash):
+        """
+        Сохранение названий ингредиентов (JSON) и матрицы ингредиентов (.npz) в кэш
+        
+        Args:
+            source_hash (str): Хэш файла рецептов, по которому построена матрица
+        """
+        try:
+            sparse.save_npz(self.matrix_cache_file, self.ingredient_matrix)
+            
+            with open(self.vocabulary_cache_file, "w", encoding="utf-8") as file:
+                json.dump({"source_hash": source_hash, "ingredients": list(self.ingredient_names)}, 
+                          file, ensure_ascii=False)
+                
+        except Exception as e:
+            print(f"Ошибка сохранения кэша матрицы сходства: {e}")
+    
     def _prepare_similarity_matrix(self):
         """
         Подготовка матрицы сходства для поиска похожих рецептов
         
-        Создает векторное представление ингредиентов для каждого рецепта
-        и подготавливает матрицу для быстрого поиска похожих рецептов.
+        Строит разреженную матрицу рецепт x ингредиент прямо из бинарных
+        колонок и векторизатор запросов с тем же словарем.
+        Если файл рецептов не менялся, матрица берется из кэша.
         """
         if self.recipes_data.empty:
             print("Нет данных о рецептах для подготовки матрицы сходства")
             return
         
         try:
-            # Создаем список ингредиентов для каждого рецепта
-            if 'ingredients_list' not in self.recipes_data.columns:
-                # Если колонки нет, создаем её из бинарных колонок ингредиентов
-                ingredient_cols = [col for col in self.recipes_data.columns 
-                                 if col not in ['rating', 'title', 'calories', 'protein', 'fat', 'sodium']]
-                
-                print(f"Создаем список ингредиентов из {len(ingredient_cols)} колонок")
-                
-                self.recipes_data['ingredients_list'] = self.recipes_data[ingredient_cols].apply(
-                    lambda row: ', '.join([col for col in ingredient_cols if row[col] == 1]), 
-                    axis=1
-                )
-            
-            # Векторизация ингредиентов с помощью CountVectorizer
-            self.vectorizer = CountVectorizer(
-                tokenizer=lambda x: [item.strip() for item in x.split(',') if item.strip()],
-                lowercase=True,
-                min_df=1  # Минимальная частота документа
-            )
+            source_hash = file_hash(self.recipes_file) if self.use_cache else None
             
-            # Создание матрицы признаков для всех рецептов
-            ingredient_lists = self.recipes_data['ingredients_list'].fillna('')
-            self.ingredient_matrix = self.vectorizer.fit_transform(ingredient_lists)
+            if self.use_cache and self._load_cached_matrix(source_hash):
+                return
+            
+            # Матрица признаков для всех рецептов из бинарных колонок ингредиентов
+            self.ingredient_matrix, self.ingredient_names = build_ingredient_matrix(self.recipes_data)
+            self.vectorizer, self._token_map = self._make_vectorizer(self.ingredient_names, self.ingredient_matrix)
             
             print(f"Матрица сходства подготовлена: {self.ingredient_matrix.shape}")
             
+            if self.use_cache:
+                self._save_cached_matrix(source_hash)
+            
         except Exception as e:
             print(f"Ошибка подготовки матрицы сходства: {e}")
             self.vectorizer = None
             self.ingredient_matrix = None
+            self.ingredient_names = None
+    
+    def _get_normalized_matrix_t(self):
+        """
+        Транспонированная L2-нормированная матрица токенов ингредиентов
+        
+        Считается один раз: после нормировки косинусное сходство
+        для всех запросов сводится к одному произведению разреженных матриц.
+        
+        Returns:
+            scipy.sparse.csr_matrix: Матрица токен × рецепт
+        """
+        if self._normalized_matrix_t is None:
+            from sklearn.preprocessing import normalize
+            
+            # Колонки рецептов переводятся в токены словаря векторизатора
+            token_matrix = self.ingredient_matrix @ self._token_map
+            normalized = normalize(token_matrix.astype(np.float64), norm='l2', axis=1)
+            self._normalized_matrix_t = normalized.T.tocsr()
+        
+        return self._normalized_matrix_t
     
     def find_similar_recipes(self, input_ingredients, top_n=3):
         """
@@ -230,96 +722,958 @@ class RecipeRecommender:
         похожих по составу ингредиентов.
         
         Args:
-            input_ingredients (str): Список ингредиентов через запятую
-            top_n (int): Количество возвращаемых рецептов
+            input_ingredients (str): Список ингредиентов через запятую
+            top_n (int): Количество возвращаемых рецептов
+            
+        Returns:
+            pd.DataFrame: Похожие рецепты с оценкой сходства
+        """
+        results = self.find_similar_recipes_batch([input_ingredients], top_n)
+        
+        if results.empty:
+            print("Не найдено похожих рецептов")
+            return pd.DataFrame()
+        
+        return results.drop(columns=['query'])
+    
+    def find_similar_recipes_batch(self, list_of_queries, top_n=3):
+        """
+        Пакетный поиск похожих рецептов
+        
+        Все запросы векторизуются вместе и оцениваются одним произведением
+        разреженных матриц, топ-N для каждого запроса выбирается через
+        argpartition по ненулевым значениям сходства.
+        
+        Args:
+            list_of_queries (list): Запросы - строки ингредиентов через запятую или списки ингредиентов
+            top_n (int): Количество рецептов на запрос
+            
+        Returns:
+            pd.DataFrame: Похожие рецепты с колонкой query (номер запроса в списке)
+                и оценкой сходства, по убыванию сходства внутри запроса
+        """
+        if self.ingredient_matrix is None or self.vectorizer is None:
+            print("Матрица сходства не подготовлена")
+            return pd.DataFrame()
+        
+        try:
+            from sklearn.preprocessing import normalize
+            
+            # Списки ингредиентов приводим к той же строке, что и в find_similar_recipes
+            queries = [q if isinstance(q, str) else ", ".join(q) for q in list_of_queries]
+            
+            # Векторизация и нормировка всех запросов сразу
+            query_matrix = normalize(self.vectorizer.transform(queries).astype(np.float64), norm='l2', axis=1)
+            
+            # Сходство всех запросов со всеми рецептами одним произведением
+            scores = (query_matrix @ self._get_normalized_matrix_t()).tocsr()
+            
+            query_ids, recipe_ids, similarities = [], [], []
+            
+            for i in range(scores.shape[0]):
+                start, end = scores.indptr[i], scores.indptr[i + 1]
+                data = scores.data[start:end]
+                indices = scores.indices[start:end]
+                
+                # Убираем рецепты с нулевым сходством
+                positive = data > 0
+                data, indices = data[positive], indices[positive]
+                
+                if len(data) > top_n:
+                    top = np.argpartition(-data, top_n - 1)[:top_n]
+                else:
+                    top = np.arange(len(data))
+                
+                # Сортировка по убыванию сходства, при равенстве - по позиции рецепта
+                top = top[np.lexsort((indices[top], -data[top]))]
+                
+                query_ids.extend([i] * len(top))
+                recipe_ids.extend(indices[top])
+                similarities.extend(data[top])
+            
+            if not recipe_ids:
+                return pd.DataFrame()
+            
+            # Выбор нужных колонок для отображения
+            columns_to_show = ['title', 'rating', 'url'] if 'url' in self.recipes_data.columns else ['rating']
+            available_columns = [col for col in columns_to_show if col in self.recipes_data.columns]
+            
+            # Копируем только нужные строки и колонки
+            results = self.recipes_data.iloc[recipe_ids, self.recipes_data.columns.get_indexer(available_columns)].copy()
+            results.insert(0, 'query', query_ids)
+            results['similarity_score'] = similarities
+            
+            return results
+            
+        except Exception as e:
+            print(f"Ошибка поиска похожих рецептов: {e}")
+            return pd.DataFrame()
+    
+    def _get_ingredient_index(self):
+        """
+        Инвертированный индекс: ингредиент -> отсортированный массив номеров рецептов
+        
+        Строится один раз из столбцов матрицы ингредиентов. Ключи нормализованы
+        так же, как при поиске: нижний регистр, названия с запятой
+        разбиты на отдельные ингредиенты.
+        
+        Returns:
+            dict: Нормализованный ингредиент -> np.ndarray номеров рецептов
+        """
+        if self._ingredient_index is None:
+            matrix_csc = self.ingredient_matrix.tocsc()
+            matrix_csc.sort_indices()
+            postings = {}
+            
+            for column, name in enumerate(self.ingredient_names):
+                recipe_ids = matrix_csc.indices[matrix_csc.indptr[column]:matrix_csc.indptr[column + 1]]
+                
+                for ingredient in split_ingredients(name.lower()):
+                    postings.setdefault(ingredient, []).append(recipe_ids)
+            
+            self._ingredient_index = {
+                ingredient: lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists))
+                for ingredient, lists in postings.items()
+            }
+        
+        return self._ingredient_index
+    
+    def find_recipe_ids(self, all_of=None, any_of=None, excludes=None):
+        """
+        Номера рецептов по ингредиентам через инвертированный индекс
+        
+        Args:
+            all_of (list): Рецепт должен содержать все эти ингредиенты
+            any_of (list): Рецепт должен содержать хотя бы один из этих ингредиентов
+            excludes (list): Рецепт не должен содержать ни одного из этих ингредиентов
+            
+        Returns:
+            np.ndarray: Отсортированные номера подходящих рецептов
+        """
+        index = self._get_ingredient_index()
+        empty = np.array([], dtype=np.int32)
+        
+        def postings(ingredients):
+            return [index.get(ing.strip().lower(), empty) for ing in ingredients if ing.strip()]
+        
+        recipe_ids = None
+        
+        if all_of:
+            lists = postings(all_of)
+            
+            # Фильтр задан, но состоит из пустых названий - ему не подходит ни один рецепт
+            if not lists:
+                return empty
+            
+            # Пересекаем списки от самого короткого, пока результат не опустеет
+            for posting in sorted(lists, key=len):
+                recipe_ids = posting if recipe_ids is None else np.intersect1d(recipe_ids, posting, assume_unique=True)
+                if len(recipe_ids) == 0:
+                    return empty
+        
+        if any_of:
+            lists = postings(any_of)
+            
+            if not lists:
+                return empty
+            
+            union = np.unique(np.concatenate(lists))
+            recipe_ids = union if recipe_ids is None else np.intersect1d(recipe_ids, union, assume_unique=True)
+        
+        if recipe_ids is None:
+            recipe_ids = np.arange(self.ingredient_matrix.shape[0])
+        
+        if excludes:
+            for posting in postings(excludes):
+                recipe_ids = np.setdiff1d(recipe_ids, posting, assume_unique=True)
+        
+        return recipe_ids
+    
+    def get_recipe_by_ingredients(self, ingredients_list, match='all', excludes=None):
+        """
+        Получение рецептов, содержащих указанные ингредиенты
+        
+        Ищет рецепты, которые содержат все (или хотя бы один из) указанные
+        ингредиенты и не содержат исключенных.
+        
+        Args:
+            ingredients_list (list): Список ингредиентов для поиска
+            match (str): 'all' - все ингредиенты, 'any' - хотя бы один
+            excludes (list): Ингредиенты, которых не должно быть в рецепте
+            
+        Returns:
+            pd.DataFrame: Подходящие рецепты
+        """
+        if self.recipes_data.empty or self.ingredient_matrix is None:
+            return pd.DataFrame()
+        
+        try:
+            if match == 'all':
+                recipe_ids = self.find_recipe_ids(all_of=ingredients_list, excludes=excludes)
+            elif match == 'any':
+                recipe_ids = self.find_recipe_ids(any_of=ingredients_list, excludes=excludes)
+            else:
+                raise ValueError(f"Неизвестный режим поиска: {match} (ожидается 'all' или 'any')")
+            
+            if len(recipe_ids) > 0:
+                # Колонка ingredients_list строится лениво из матрицы ингредиентов
+                self._ensure_ingredients_list()
+                
+                print(f"Найдено {len(recipe_ids)} рецептов с указанными ингредиентами")
+                return self.recipes_data.iloc[recipe_ids]
+            else:
+                print("Не найдено рецептов с указанными ингредиентами")
+                return pd.DataFrame()
+                
+        except Exception as e:
+            print(f"Ошибка поиска рецептов по ингредиентам: {e}")
+            return pd.DataFrame()
+
+
+def edit_distance(first, second):
+    """
+    Расстояние Левенштейна между двумя строками
+    
+    Args:
+        first (str): Первая строка
+        second (str): Вторая строка
+        
+    Returns:
+        int: Минимальное число вставок, удалений и замен символов
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    
+    previous = list(range(len(second) + 1))
+    for i, char_first in enumerate(first, start=1):
+        current = [i]
+        for j, char_second in enumerate(second, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_first != char_second)
+            ))
+        previous = current
+    
+    return previous[-1]
+
+
+class IngredientResolver:
+    """Нечеткое сопоставление названий ингредиентов с известными названиями"""
+    
+    def __init__(self, names, min_score=0.4, candidates=5, verify=True):
+        """
+        Инициализация класса
+        
+        Строит индекс символьных триграмм: триграмма -> номера названий.
+        
+        Args:
+            names (iterable): Известные (канонические) названия ингредиентов
+            min_score (float): Минимальное сходство триграмм (коэффициент Дайса)
+            candidates (int): Сколько лучших по триграммам названий проверять
+            verify (bool): Выбирать среди кандидатов по расстоянию Левенштейна
+        """
+        self.min_score = min_score
+        self.candidates = candidates
+        self.verify = verify
+        self.names = sorted({self.normalize(name) for name in names if self.normalize(name)})
+        self._ids = {name: index for index, name in enumerate(self.names)}
+        
+        postings = {}
+        self._gram_counts = np.zeros(len(self.names), dtype=np.int32)
+        
+        for index, name in enumerate(self.names):
+            grams = self.trigrams(name)
+            self._gram_counts[index] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+        
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+    
+    @classmethod
+    def from_sources(cls, nutrition=None, recommender=None, **params):
+        """
+        Резолвер по объединению названий из данных о питании и словаря рецептов
+        
+        Args:
+            nutrition (NutritionFacts): Данные о питании
+            recommender (RecipeRecommender): Рекомендатель рецептов
+            **params: Параметры IngredientResolver
+            
+        Returns:
+            IngredientResolver: Резолвер
+        """
+        names = []
+        
+        if nutrition is not None and nutrition.ingredient_column is not None:
+            names.extend(nutrition.nutrition_data[nutrition.ingredient_column].dropna())
+        
+        if recommender is not None and recommender.ingredient_names is not None:
+            for name in recommender.ingredient_names:
+                names.extend(split_ingredients(name))
+        
+        return cls(names, **params)
+    
+    @staticmethod
+    def normalize(name):
+        """
+        Нормализация названия: нижний регистр, одиночные пробелы
+        
+        Args:
+            name (str): Название ингредиента
+            
+        Returns:
+            str: Нормализованное название
+        """
+        return ' '.join(str(name).lower().split())
+    
+    @staticmethod
+    def trigrams(text):
+        """
+        Множество символьных триграмм строки (с пробелами по краям)
+        
+        Args:
+            text (str): Нормализованная строка
+            
+        Returns:
+            set: Триграммы
+        """
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    def candidates_for(self, query):
+        """
+        Лучшие по сходству триграмм названия для запроса
+        
+        Args:
+            query (str): Название ингредиента
+            
+        Returns:
+            list: Пары (название, сходство) по убыванию сходства
+        """
+        grams = self.trigrams(self.normalize(query))
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        
+        if not postings:
+            return []
+        
+        # Число общих триграмм с каждым названием
+        common = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        ids = np.flatnonzero(common)
+        scores = 2 * common[ids] / (len(grams) + self._gram_counts[ids])
+        
+        top = ids[np.argsort(-scores, kind='stable')[:self.candidates]]
+        return [(self.names[index], float(2 * common[index] / (len(grams) + self._gram_counts[index]))) for index in top]
+    
+    def resolve(self, query):
+        """
+        Каноническое название ингредиента для запроса
+        
+        Args:
+            query (str): Название ингредиента (возможно, с опечаткой)
+            
+        Returns:
+            str: Каноническое название или None, если похожих нет
+        """
+        normalized = self.normalize(query)
+        
+        if normalized in self._ids:
+            return normalized
+        
+        candidates = [(name, score) for name, score in self.candidates_for(normalized) if score >= self.min_score]
+        
+        if not candidates:
+            return None
+        
+        if self.verify:
+            # Уточняем порядок кандидатов: среднее сходства триграмм и доли совпадения по правке
+            def verified_score(item):
+                name, score = item
+                distance = edit_distance(normalized, name) / max(len(normalized), len(name))
+                return (score + 1 - distance) / 2
+
+            return max(candidates, key=verified_score)[0]
+        
+        return candidates[0][0]
+    
+    def resolve_many(self, queries):
+        """
+        Канонические названия для нескольких запросов
+        
+        Args:
+            queries (list): Названия ингредиентов
+            
+        Returns:
+            list: Каноническое название (или None) для каждого запроса
+        """
+        return [self.resolve(query) for query in queries]
+
+
+# Вспомогательные функции для работы с моделями
+
+# Классы рейтинга в порядке кодирования при обучении модели (0 - bad, 1 - so-so, 2 - great)
+RATING_CLASSES = ['bad', 'so-so', 'great']
+
+# Ключевые слова для оценки без модели
+BAD_KEYWORDS = ['rotten', 'spoiled', 'artificial', 'processed', 'old', 'stale']
+GREAT_KEYWORDS = ['fresh', 'organic', 'natural', 'chocolate', 'honey', 'fruits']
+
+
+def rating_class(rating):
+    """
+    Класс рейтинга по числовому рейтингу (как при подготовке целевой переменной)
+    
+    Args:
+        rating (float): Рейтинг рецепта
+        
+    Returns:
+        str: Класс рейтинга (bad, so-so, great)
+    """
+    if rating <= 1:
+        return "bad"
+    elif rating <= 3:
+        return "so-so"
+    else:
+        return "great"
+
+
+def keyword_rating(ingredients):
+    """
+    Простая оценка рейтинга по ключевым словам (когда модель недоступна)
+    
+    Args:
+        ingredients (list): Список ингредиентов
+        
+    Returns:
+        str: Класс рейтинга (bad, so-so, great)
+    """
+    ingredients_str = ", ".join(ingredients).lower()
+    
+    bad_count = sum(1 for word in BAD_KEYWORDS if word in ingredients_str)
+    great_count = sum(1 for word in GREAT_KEYWORDS if word in ingredients_str)
+    
+    if bad_count > great_count:
+        return "bad"
+    elif great_count > bad_count:
+        return "great"
+    else:
+        return "so-so"
+
+
+class CompiledTreeModel:
+    """
+    Дерево решений, случайный лес или градиентный бустинг sklearn,
+    упакованные в плоские массивы NumPy
+    
+    Все деревья хранятся одним набором массивов узлов (признак, порог,
+    левый и правый потомок, значение), у листьев оба потомка указывают
+    на сам лист. Прогноз спускается по всем деревьям для всех строк сразу,
+    на каждом шаге только по парам (строка, дерево), еще не дошедшим до листа,
+    а значения листьев суммируются в том же порядке, что и в sklearn,
+    поэтому предсказания совпадают в точности.
+    Для прогноза не нужны ни sklearn, ни joblib.
+    """
+    
+    def __init__(self, kind, classifier, feature, threshold, left, right, roots, values,
+                 n_features, columns=None, init=None, classes=None):
+        """
+        Инициализация класса
+        
+        Args:
+            kind (str): tree, forest или boosting
+            classifier (bool): Классификатор (иначе регрессор)
+            feature (np.ndarray): Признак разбиения каждого узла
+            threshold (np.ndarray): Порог разбиения каждого узла
+            left (np.ndarray): Левый потомок (для листа - сам лист)
+            right (np.ndarray): Правый потомок (для листа - сам лист)
+            roots (np.ndarray): Корень каждого дерева
+            values (np.ndarray): Значения узлов (узел x выход)
+            n_features (int): Число признаков модели
+            columns (np.ndarray): Для бустинга - выход, в который пишет каждое дерево
+            init (np.ndarray): Для бустинга - начальный прогноз
+            classes (np.ndarray): Классы классификатора
+        """
+        self.kind = kind
+        self.classifier = classifier
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.roots = roots
+        self.values = values
+        self.n_features_in_ = int(n_features)
+        self.columns = columns
+        self.init = init
+        
+        # Потомки узла i - _children[2 * i] (левый) и _children[2 * i + 1] (правый)
+        self._children = np.stack([left, right], axis=1).ravel().astype(np.intp)
+        self._feature = feature.astype(np.intp)
+        self._is_leaf = left == np.arange(len(left))
+        
+        # classes_ есть только у классификаторов, как у моделей sklearn
+        if classifier:
+            self.classes_ = classes
+    
+    @classmethod
+    def from_model(cls, model):
+        """
+        Упаковка обученной модели sklearn
+        
+        Args:
+            model: DecisionTree, RandomForest или GradientBoosting (Classifier или Regressor)
+            
+        Returns:
+            CompiledTreeModel: Упакованная модель
+        """
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Поддерживаются только модели с одним выходом")
+        
+        classifier = hasattr(model, 'classes_')
+        columns = None
+        init = None
+        
+        if hasattr(model, 'tree_'):
+            kind = 'tree'
+            trees = [model]
+        elif hasattr(model, 'estimators_') and hasattr(model, 'learning_rate'):
+            kind = 'boosting'
+            if not (isinstance(model.init_, str) or type(model.init_).__name__.startswith('Dummy')):
+                raise ValueError("Поддерживается только бустинг с начальным прогнозом по умолчанию")
+            
+            # Деревья по стадиям, внутри стадии - по выходам (как в predict_stages)
+            stages, n_outputs = model.estimators_.shape
+            trees = list(model.estimators_.ravel())
+            columns = np.tile(np.arange(n_outputs, dtype=np.int32), stages)
+            
+            # Начальный прогноз не зависит от признаков
+            init = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+        elif hasattr(model, 'estimators_'):
+            kind = 'forest'
+            trees = list(model.estimators_)
+        else:
+            raise ValueError(f"Неподдерживаемая модель: {type(model).__name__}")
+        
+        feature, threshold, left, right, values = [], [], [], [], []
+        roots = np.zeros(len(trees), dtype=np.int32)
+        offset = 0
+        
+        for index, estimator in enumerate(trees):
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left < 0
+            
+            roots[index] = offset
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(offset + np.where(is_leaf, nodes, tree.children_left))
+            right.append(offset + np.where(is_leaf, nodes, tree.children_right))
+            
+            if kind == 'boosting':
+                values.append(model.learning_rate * tree.value[:, 0, :1])
+            elif classifier:
+                values.append(tree.value[:, 0, :len(model.classes_)])
+            else:
+                values.append(tree.value[:, 0, :1])
+            
+            offset += tree.node_count
+        
+        return cls(
+            kind, classifier,
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            roots,
+            np.concatenate(values).astype(np.float64),
+            model.n_features_in_,
+            columns,
+            init,
+            np.asarray(model.classes_) if classifier else None
+        )
+    
+    def to_arrays(self):
+        """
+        Массивы модели для сохранения через np.savez
+        
+        Returns:
+            dict: Название -> массив
+        """
+        return {
+            'kind': np.array(self.kind),
+            'classifier': np.array(self.classifier),
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'roots': self.roots,
+            'values': self.values,
+            'n_features': np.array(self.n_features_in_),
+            'columns': self.columns if self.columns is not None else np.zeros(0, dtype=np.int32),
+            'init': self.init if self.init is not None else np.zeros(0),
+            'classes': self.classes_ if self.classifier else np.zeros(0),
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Модель из массивов, сохраненных to_arrays
+        
+        Args:
+            arrays: Словарь или NpzFile с массивами модели
+            
+        Returns:
+            CompiledTreeModel: Упакованная модель
+        """
+        columns = arrays['columns']
+        init = arrays['init']
+        classifier = bool(arrays['classifier'])
+        
+        return cls(
+            str(arrays['kind']), classifier,
+            arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+            arrays['roots'], arrays['values'], arrays['n_features'],
+            columns if len(columns) else None,
+            init if len(init) else None,
+            arrays['classes'] if classifier else None
+        )
+    
+    def apply(self, features):
+        """
+        Листья всех деревьев для каждой строки
+        
+        Args:
+            features: Матрица признаков (плотная или разреженная)
+            
+        Returns:
+            np.ndarray: Номер листа (строка x дерево)
+        """
+        # Как и sklearn, сравниваем признаки float32 с порогами float64
+        if sparse.issparse(features):
+            features = features.toarray()
+        features = np.asarray(features, dtype=np.float32)
+        n_rows, n_features = features.shape
+        flat_features = features.ravel()
+        
+        # Пары (строка, дерево) в одном плоском массиве, спускаются только еще не дошедшие до листа
+        nodes = np.tile(self.roots.astype(np.intp), n_rows)
+        positions = np.flatnonzero(~self._is_leaf[nodes])
+        current = nodes[positions]
+        offsets = positions // len(self.roots) * n_features
+        
+        while len(positions):
+            go_right = ~(flat_features[offsets + self._feature[current]] <= self.threshold[current])
+            current = self._children[2 * current + go_right]
+            
+            done = self._is_leaf[current]
+            if done.any():
+                nodes[positions[done]] = current[done]
+                keep = ~done
+                positions, current, offsets = positions[keep], current[keep], offsets[keep]
+        
+        return nodes.reshape(n_rows, len(self.roots))
+    
+    def _raw_predict(self, features):
+        """
+        Сумма значений листьев (для леса - среднее)
+        
+        Args:
+            features: Матрица признаков
+            
+        Returns:
+            np.ndarray: Сырой прогноз (строка x выход)
+        """
+        leaves = self.values[self.apply(features)]
+        
+        # np.add.accumulate складывает строго по порядку деревьев, как sklearn,
+        # поэтому суммы совпадают до последнего бита (в отличие от np.sum)
+        if self.kind == 'boosting':
+            raw = np.empty((len(leaves), len(self.init)))
+            for column, init in enumerate(self.init):
+                stages = leaves[:, self.columns == column, 0]
+                start = np.full((len(leaves), 1), init)
+                raw[:, column] = np.add.accumulate(np.hstack([start, stages]), axis=1)[:, -1]
+            return raw
+        
+        raw = np.add.accumulate(leaves, axis=1)[:, -1]
+        
+        if self.kind == 'forest':
+            raw /= len(self.roots)
+        return raw
+    
+    def predict(self, features):
+        """
+        Прогноз для каждой строки матрицы признаков
+        
+        Args:
+            features: Матрица признаков (плотная или разреженная)
+            
+        Returns:
+            np.ndarray: Класс (для классификатора) или значение (для регрессора)
+        """
+        raw = self._raw_predict(features)
+        
+        if not self.classifier:
+            return raw[:, 0]
+        
+        if self.kind == 'boosting' and raw.shape[1] == 1:
+            return self.classes_[(raw[:, 0] >= 0).astype(int)]
+        
+        return self.classes_[np.argmax(raw, axis=1)]
+
+
+class RatingForecaster:
+    """Прогноз класса рейтинга блюда по спискам ингредиентов"""
+    
+    def __init__(self, model=None, feature_names=None, labels=None):
+        """
+        Инициализация класса
+        
+        Args:
+            model: Обученная модель (predict по матрице рецепт x ингредиент)
+            feature_names (list): Ингредиенты - признаки модели в порядке обучения
+            labels (list): Класс рейтинга для каждого кода класса модели
+        """
+        self.model = model
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.labels = list(labels) if labels is not None else None
+        self._vocabulary = {}
+        
+        for index, name in enumerate(self.feature_names or []):
+            self._vocabulary.setdefault(str(name).strip().lower(), index)
+        
+        # Статистика: сколько запросов и за какое время обработано моделью и без нее
+        self.predictions = 0
+        self.predict_time = 0.0
+        self.fallbacks = Counter()
+        self.fallback_time = 0.0
+        self._reported = set()
+    
+    @classmethod
+    def load(cls, model_path, feature_names=None, mmap_mode='r'):
+        """
+        Загрузка модели (или пакета модель + признаки) через joblib
+        
+        Массивы модели отображаются в память (mmap_mode), а не копируются.
+        Если файл содержит пакет, сохраненный save(), признаки берутся из него,
+        иначе используются feature_names. Файл .npz - упакованная модель
+        CompiledTreeModel, для нее joblib и sklearn не загружаются.
+        
+        Args:
+            model_path (str): Путь к файлу модели
+            feature_names (list): Признаки модели, если их нет в файле
+            mmap_mode (str): Режим отображения массивов в память (None - читать целиком)
+            
+        Returns:
+            RatingForecaster: Прогнозист (без модели, если загрузить не удалось)
+        """
+        try:
+            if model_path.endswith('.npz'):
+                with np.load(model_path, allow_pickle=False) as arrays:
+                    model = CompiledTreeModel.from_arrays(arrays)
+                    saved_names = [str(name) for name in arrays['feature_names']]
+                    saved_labels = [str(label) for label in arrays['labels']]
+                
+                print(f"Упакованная модель загружена из {model_path}")
+                return cls(model, saved_names or feature_names, saved_labels or None)
+            
+            import joblib
+            loaded = joblib.load(model_path, mmap_mode=mmap_mode)
+            print(f"Модель успешно загружена из {model_path}")
+        except FileNotFoundError:
+            print(f"Файл модели не найден: {model_path}")
+            return cls(feature_names=feature_names)
+        except Exception as e:
+            print(f"Ошибка загрузки модели: {e}")
+            return cls(feature_names=feature_names)
+        
+        if isinstance(loaded, dict) and 'model' in loaded:
+            return cls(
+                loaded['model'],
+                loaded.get('feature_names', feature_names),
+                loaded.get('labels')
+            )
+        
+        return cls(loaded, feature_names)
+    
+    def save(self, model_path):
+        """
+        Сохранение модели вместе с признаками и классами одним файлом
+        
+        В файл .npz модель сохраняется упакованной (CompiledTreeModel),
+        в остальные - через joblib.
+        
+        Args:
+            model_path (str): Путь к файлу модели
+        """
+        if model_path.endswith('.npz'):
+            model = self.model
+            if not isinstance(model, CompiledTreeModel):
+                model = CompiledTreeModel.from_model(model)
+            
+            np.savez_compressed(
+                model_path,
+                feature_names=np.array(self.feature_names or [], dtype=str),
+                labels=np.array(self.labels or [], dtype=str),
+                **model.to_arrays()
+            )
+            return
+        
+        import joblib
+        joblib.dump(
+            {'model': self.model, 'feature_names': self.feature_names, 'labels': self.labels},
+            model_path
+        )
+    
+    def featurize(self, list_of_ingredient_lists):
+        """
+        Бинарная матрица признаков для нескольких списков ингредиентов
+        
+        Неизвестные модели ингредиенты пропускаются.
+        
+        Args:
+            list_of_ingredient_lists (list): Списки ингредиентов
+            
+        Returns:
+            csr_matrix: Матрица запрос x признак (float32)
+        """
+        rows = []
+        cols = []
+        
+        for row, ingredients in enumerate(list_of_ingredient_lists):
+            for ingredient in ingredients:
+                col = self._vocabulary.get(str(ingredient).strip().lower())
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(list_of_ingredient_lists), len(self.feature_names))
+        )
+        
+        # Повторы ингредиента в запросе - все равно признак 0/1
+        matrix.data[:] = 1
+        return matrix
+    
+    def _fallback_reason(self):
+        """
+        Причина, по которой модель нельзя использовать
+        
+        Returns:
+            str: no_model, no_features, feature_mismatch или None, если модель готова
+        """
+        if self.model is None:
+            return 'no_model'
+        if not self.feature_names:
+            return 'no_features'
+        
+        expected = getattr(self.model, 'n_features_in_', len(self.feature_names))
+        if expected != len(self.feature_names):
+            return 'feature_mismatch'
+        
+        return None
+    
+    def _report(self, reason, details):
+        """
+        Сообщение о переходе на простую логику (один раз для каждой причины)
+        
+        Args:
+            reason (str): Причина
+            details (str): Подробности
+        """
+        if reason not in self._reported:
+            self._reported.add(reason)
+            print(f"Прогноз без модели ({reason}): {details}")
+    
+    def _label(self, prediction):
+        """
+        Класс рейтинга по ответу модели
+        
+        Args:
+            prediction: Предсказание модели (код класса, метка или рейтинг)
             
         Returns:
-            pd.DataFrame: Похожие рецепты с оценкой сходства
+            str: Класс рейтинга (bad, so-so, great)
         """
-        if self.ingredient_matrix is None or self.vectorizer is None:
-            print("Матрица сходства не подготовлена")
-            return pd.DataFrame()
+        if isinstance(prediction, str):
+            return prediction
         
-        try:
-            # Векторизация входных ингредиентов
-            input_vec = self.vectorizer.transform([input_ingredients])
-            
-            # Вычисление косинусного сходства между входными ингредиентами и всеми рецептами
-            similarities = cosine_similarity(input_vec, self.ingredient_matrix).flatten()
-            
-            # Получение топ-N индексов по убыванию сходства
-            top_indices = similarities.argsort()[-top_n:][::-1]
-            
-            # Фильтрация по сходству (убираем рецепты с нулевым сходством)
-            top_indices = [idx for idx in top_indices if similarities[idx] > 0]
-            
-            if not top_indices:
-                print("Не найдено похожих рецептов")
-                return pd.DataFrame()
-            
-            # Получение результатов
-            results = self.recipes_data.iloc[top_indices].copy()
-            
-            # Добавление информации о сходстве
-            results['similarity_score'] = similarities[top_indices]
-            
-            # Сортировка по сходству (от большего к меньшему)
-            results = results.sort_values('similarity_score', ascending=False)
-            
-            # Выбор нужных колонок для отображения
-            columns_to_show = ['title', 'rating', 'url'] if 'url' in results.columns else ['rating']
-            available_columns = [col for col in columns_to_show if col in results.columns]
-            
-            # Возвращаем результаты с колонкой сходства
-            return results[available_columns + ['similarity_score']]
-            
-        except Exception as e:
-            print(f"Ошибка поиска похожих рецептов: {e}")
-            return pd.DataFrame()
+        if self.labels is not None:
+            return self.labels[int(prediction)]
+        
+        # Классификатор обучен на кодах RATING_CLASSES, регрессор - на рейтинге
+        if hasattr(self.model, 'classes_') and float(prediction).is_integer() and 0 <= prediction < len(RATING_CLASSES):
+            return RATING_CLASSES[int(prediction)]
+        
+        return rating_class(float(prediction))
     
-    def get_recipe_by_ingredients(self, ingredients_list):
+    def predict_many(self, list_of_ingredient_lists):
         """
-        Получение рецептов, содержащих указанные ингредиенты
+        Прогноз классов рейтинга для нескольких списков ингредиентов
         
-        Ищет рецепты, которые содержат все указанные ингредиенты.
+        Все запросы переводятся в признаки одной матрицей и оцениваются
+        одним вызовом модели. Если модель недоступна или выдала ошибку,
+        используется оценка по ключевым словам, а случай учитывается
+        в fallbacks и fallback_time.
         
         Args:
-            ingredients_list (list): Список ингредиентов для поиска
+            list_of_ingredient_lists (list): Списки ингредиентов
             
         Returns:
-            pd.DataFrame: Подходящие рецепты
+            list: Класс рейтинга (bad, so-so, great) для каждого списка
         """
-        if self.recipes_data.empty:
-            return pd.DataFrame()
+        list_of_ingredient_lists = list(list_of_ingredient_lists)
+        reason = self._fallback_reason()
         
-        try:
-            # Поиск рецептов, содержащих все указанные ингредиенты
-            matching_recipes = []
-            
-            for _, recipe in self.recipes_data.iterrows():
-                recipe_ingredients = recipe.get('ingredients_list', '')
+        if reason is None:
+            start = time.perf_counter()
+            try:
+                predictions = self.model.predict(self.featurize(list_of_ingredient_lists))
+                labels = [self._label(prediction) for prediction in predictions]
                 
-                if isinstance(recipe_ingredients, str):
-                    # Разбиваем список ингредиентов рецепта на отдельные элементы
-                    recipe_ingredients = [ing.strip().lower() for ing in recipe_ingredients.split(',')]
-                    
-                    # Проверяем, содержит ли рецепт все указанные ингредиенты
-                    if all(ing.lower() in recipe_ingredients for ing in ingredients_list):
-                        matching_recipes.append(recipe)
-            
-            if matching_recipes:
-                print(f"Найдено {len(matching_recipes)} рецептов с указанными ингредиентами")
-                return pd.DataFrame(matching_recipes)
-            else:
-                print("Не найдено рецептов с указанными ингредиентами")
-                return pd.DataFrame()
+                self.predictions += len(labels)
+                self.predict_time += time.perf_counter() - start
+                return labels
                 
-        except Exception as e:
-            print(f"Ошибка поиска рецептов по ингредиентам: {e}")
-            return pd.DataFrame()
-
+            except Exception as e:
+                reason = 'predict_error'
+                self._report(reason, e)
+        else:
+            self._report(reason, "используется оценка по ключевым словам")
+        
+        start = time.perf_counter()
+        labels = [keyword_rating(ingredients) for ingredients in list_of_ingredient_lists]
+        
+        self.fallbacks[reason] += len(labels)
+        self.fallback_time += time.perf_counter() - start
+        return labels
+    
+    def predict(self, ingredients):
+        """
+        Прогноз класса рейтинга для одного списка ингредиентов
+        
+        Args:
+            ingredients (list): Список ингредиентов
+            
+        Returns:
+            str: Класс рейтинга (bad, so-so, great)
+        """
+        return self.predict_many([ingredients])[0]
+    
+    def stats(self):
+        """
+        Статистика прогнозов
+        
+        Returns:
+            dict: Количество и время прогнозов моделью и без нее по причинам
+        """
+        return {
+            'predictions': self.predictions,
+            'predict_time': self.predict_time,
+            'fallbacks': dict(self.fallbacks),
+            'fallback_time': self.fallback_time,
+        }
 
-# Вспомогательные функции для работы с моделями
 
 def load_model(model_path):
     """
@@ -331,65 +1685,68 @@ def load_model(model_path):
     Returns:
         object: Загруженная модель или None в случае ошибки
     """
-    try:
-        import pickle
-        with open(model_path, "rb") as file:
-            model = pickle.load(file)
-        print(f"Модель успешно загружена из {model_path}")
-        return model
-    except FileNotFoundError:
-        print(f"Файл модели не найден: {model_path}")
-        return None
-    except Exception as e:
-        print(f"Ошибка загрузки модели: {e}")
-        return None
+    return RatingForecaster.load(model_path).model
 
 
-def forecast_rating(model, ingredients):
+def forecast_rating(model, ingredients, feature_names=None):
     """
     Прогнозирование рейтинга блюда на основе ингредиентов
     
     Использует обученную модель для предсказания рейтинга блюда
-    по списку ингредиентов.
+    по списку ингредиентов. Для нескольких прогнозов лучше один раз
+    создать RatingForecaster и вызывать predict_many.
     
     Args:
         model: Обученная модель машинного обучения
         ingredients (list): Список ингредиентов
+        feature_names (list): Ингредиенты - признаки модели в порядке обучения
         
     Returns:
         str: Прогнозируемый класс рейтинга (bad, so-so, great)
     """
-    if model is None:
-        print("Модель не загружена, возвращаю значение по умолчанию")
-        return "so-so"  # Значение по умолчанию
-    
-    try:
-        # Преобразование ингредиентов в строку
-        ingredients_str = ", ".join(ingredients)
-        
-        # Прогнозирование с помощью модели
-        prediction = model.predict([ingredients_str])[0]
-        
-        # Преобразование числового прогноза в категории, если нужно
-        if isinstance(prediction, (int, float)):
-            if prediction <= 1:
-                return "bad"
-            elif prediction <= 3:
-                return "so-so"
-            else:
-                return "great"
-        
-        return prediction
-        
-    except Exception as e:
-        print(f"Ошибка прогнозирования: {e}")
-        return "so-so"
+    return RatingForecaster(model, feature_names).predict(ingredients)
+
+
+# Полосы оценки пищевой ценности: (от, до включительно, балл), проверяются по порядку.
+# Оптимально 20-30% от дневной нормы за прием пищи
+NUTRITION_SCORE_BANDS = [
+    (20, 30, 100),  # Отлично
+    (15, 40, 80),   # Хорошо
+    (10, 50, 60),   # Удовлетворительно
+    (5, 70, 40),    # Плохо
+]
+NUTRITION_SCORE_DEFAULT = 20  # Очень плохо
+
+# Ключевые слова времени приема пищи. Порядок задает приоритет: сначала все категории
+# проверяются по названию рецепта, затем по ингредиентам
+MEAL_TIME_KEYWORDS = {
+    # Ключевые слова для завтрака
+    'breakfast': [
+        'breakfast', 'brunch', 'pancake', 'waffle', 'omelet', 'omelette', 
+        'muffin', 'cereal', 'oatmeal', 'granola', 'yogurt', 'smoothie',
+        'toast', 'bagel', 'croissant', 'french toast', 'eggs benedict'
+    ],
+    # Ключевые слова для обеда
+    'lunch': [
+        'lunch', 'sandwich', 'salad', 'soup', 'pasta', 'pizza', 'burger',
+        'wrap', 'quesadilla', 'taco', 'burrito', 'stir-fry', 'curry'
+    ],
+    # Ключевые слова для ужина
+    'dinner': [
+        'dinner', 'supper', 'roast', 'grill', 'bake', 'stew', 'casserole',
+        'lasagna', 'meatloaf', 'steak', 'chicken', 'fish', 'seafood'
+    ],
+}
+DEFAULT_MEAL_TIME = 'dinner'  # Если ничего не подошло, считаем ужином
+
+# Приемы пищи в меню
+MEAL_TIMES = ['breakfast', 'lunch', 'dinner']
 
 
 class DailyMenuGenerator:
     """Класс для генерации дневного меню"""
     
-    def __init__(self, recipes_file, nutrition_file, daily_values_file):
+    def __init__(self, recipes_file, nutrition_file, daily_values_file, meal_time_keywords=None):
         """
         Инициализация класса
         
@@ -397,13 +1754,26 @@ class DailyMenuGenerator:
             recipes_file (str): Путь к файлу с рецептами
             nutrition_file (str): Путь к файлу с данными о питании
             daily_values_file (str): Путь к файлу с дневными нормами
+            meal_time_keywords (dict): Время приема пищи -> ключевые слова в порядке
+                приоритета. По умолчанию MEAL_TIME_KEYWORDS
         """
         self.recipes_file = recipes_file
         self.nutrition_file = nutrition_file
         self.daily_values_file = daily_values_file
+        self.meal_time_keywords = meal_time_keywords or MEAL_TIME_KEYWORDS
+        
+        # Одно регулярное выражение-альтернатива на каждое время приема пищи
+        self._meal_time_patterns = [
+            (meal_time, re.compile('|'.join(re.escape(keyword.lower()) for keyword in keywords)))
+            for meal_time, keywords in self.meal_time_keywords.items() if keywords
+        ]
         self.recipes_data = None
+        self.nutrition = None
         self.nutrition_data = None
         self.daily_values = None
+        self.ingredient_matrix = None
+        self.ingredient_names = None
+        self.recipe_nutrition = None
         self._load_data()
     
     def _load_data(self):
@@ -412,16 +1782,13 @@ class DailyMenuGenerator:
         """
         try:
             # Загружаем рецепты
-            self.recipes_data = pd.read_csv(self.recipes_file)
+            self.recipes_data = load_recipes(self.recipes_file)
             print(f"Рецепты для меню загружены: {len(self.recipes_data)} записей")
             
-            # Загружаем данные о питании
-            self.nutrition_data = pd.read_csv(self.nutrition_file)
-            print(f"Данные о питании для меню загружены: {len(self.nutrition_data)} записей")
-            
-            # Загружаем дневные нормы
-            self.daily_values = pd.read_csv(self.daily_values_file)
-            print(f"Дневные нормы для меню загружены: {len(self.daily_values)} питательных веществ")
+            # Данные о питании и дневные нормы - общий экземпляр с nutritionist.py
+            self.nutrition = get_nutrition_facts(self.nutrition_file, self.daily_values_file)
+            self.nutrition_data = self.nutrition.nutrition_data
+            self.daily_values = self.nutrition.daily_values
             
         except FileNotFoundError as e:
             print(f"Файл не найден: {e}")
@@ -445,162 +1812,229 @@ class DailyMenuGenerator:
         Returns:
             str: Категория времени приема пищи (breakfast, lunch, dinner)
         """
-        title_lower = recipe_title.lower()
-        ingredients_lower = recipe_ingredients.lower()
+        # Проверяем название рецепта, затем ингредиенты
+        for text in (recipe_title.lower(), recipe_ingredients.lower()):
+            for meal_time, pattern in self._meal_time_patterns:
+                if pattern.search(text):
+                    return meal_time
         
-        # Ключевые слова для завтрака
-        breakfast_keywords = [
-            'breakfast', 'brunch', 'pancake', 'waffle', 'omelet', 'omelette', 
-            'muffin', 'cereal', 'oatmeal', 'granola', 'yogurt', 'smoothie',
-            'toast', 'bagel', 'croissant', 'french toast', 'eggs benedict'
-        ]
+        return DEFAULT_MEAL_TIME
+    
+    def _categorize_meal_times(self, recipe_titles, recipe_ingredients):
+        """
+        Категоризация всех рецептов по времени приема пищи
         
-        # Ключевые слова для обеда
-        lunch_keywords = [
-            'lunch', 'sandwich', 'salad', 'soup', 'pasta', 'pizza', 'burger',
-            'wrap', 'quesadilla', 'taco', 'burrito', 'stir-fry', 'curry'
-        ]
+        Регулярные выражения применяются к колонкам в порядке приоритета
+        _categorize_meal_time, каждое - только к рецептам без категории.
         
-        # Ключевые слова для ужина
-        dinner_keywords = [
-            'dinner', 'supper', 'roast', 'grill', 'bake', 'stew', 'casserole',
-            'lasagna', 'meatloaf', 'steak', 'chicken', 'fish', 'seafood'
-        ]
+        Args:
+            recipe_titles (pd.Series): Названия рецептов
+            recipe_ingredients (pd.Series): Списки ингредиентов
+            
+        Returns:
+            np.ndarray: Категория времени приема пищи для каждого рецепта
+        """
+        labels = np.full(len(recipe_titles), DEFAULT_MEAL_TIME, dtype=object)
+        undecided = np.ones(len(recipe_titles), dtype=bool)
         
-        # Проверяем название рецепта
-        for keyword in breakfast_keywords:
-            if keyword in title_lower:
-                return 'breakfast'
+        for texts in (recipe_titles, recipe_ingredients):
+            texts = texts.fillna('').astype(str).str.lower()
+            
+            for meal_time, pattern in self._meal_time_patterns:
+                # Проверяем только рецепты, которым еще не назначено время
+                positions = np.flatnonzero(undecided)
+                if len(positions) == 0:
+                    return labels
+                
+                matched = positions[texts.iloc[positions].str.contains(pattern).to_numpy(dtype=bool)]
+                labels[matched] = meal_time
+                undecided[matched] = False
         
-        for keyword in lunch_keywords:
-            if keyword in title_lower:
-                return 'lunch'
+        return labels
+    
+    def _ingredient_nutrition_map(self):
+        """
+        Разреженная матрица колонка ингредиента рецепта x строка nutrition_data
         
-        for keyword in dinner_keywords:
-            if keyword in title_lower:
-                return 'dinner'
+        Название колонки разбивается по запятым так же, как строка ингредиентов
+        рецепта, и каждая часть ищется в индексе NutritionFacts.
         
-        # Если название не помогло, проверяем ингредиенты
-        for keyword in breakfast_keywords:
-            if keyword in ingredients_lower:
-                return 'breakfast'
+        Returns:
+            csr_matrix: Матрица соответствия (колонки без данных о питании - пустые строки)
+        """
+        rows = []
+        names = []
         
-        for keyword in lunch_keywords:
-            if keyword in ingredients_lower:
-                return 'lunch'
+        for column, name in enumerate(self.ingredient_names):
+            for ingredient in split_ingredients(name.lower()):
+                rows.append(column)
+                names.append(ingredient)
         
-        for keyword in dinner_keywords:
-            if keyword in ingredients_lower:
-                return 'dinner'
+        positions = self.nutrition.row_positions(names)
+        rows = np.array(rows, dtype=np.int64)
+        found = positions >= 0
         
-        # По умолчанию считаем ужином
-        return 'dinner'
+        return sparse.csr_matrix(
+            (np.ones(found.sum()), (rows[found], positions[found])),
+            shape=(len(self.ingredient_names), len(self.nutrition_data))
+        )
     
-    def _calculate_recipe_nutrition(self, recipe_ingredients):
+    def _calculate_recipe_nutrition(self):
         """
-        Расчет пищевой ценности рецепта на основе ингредиентов
+        Расчет пищевой ценности всех рецептов одним матричным произведением
+        
+        (рецепт x ингредиент) @ (ингредиент x строка данных о питании) @
+        (строка данных о питании x питательное вещество), затем деление
+        сумм на дневные нормы.
         
-        Args:
-            recipe_ingredients (str): Список ингредиентов рецепта
-            
         Returns:
-            dict: Словарь с пищевой ценностью рецепта
+            pd.DataFrame: Проценты от дневной нормы, строки - рецепты, колонки - питательные вещества
         """
         if self.nutrition_data.empty or self.daily_values.empty:
-            return {}
+            return pd.DataFrame(index=self.recipes_data.index)
         
         try:
-            # Разбиваем ингредиенты на отдельные элементы
-            ingredients_list = [ing.strip().lower() for ing in recipe_ingredients.split(',') if ing.strip()]
-            
-            # Ищем колонку с названием ингредиента
-            ingredient_col = None
-            for col in self.nutrition_data.columns:
-                if col.lower() == 'ingredient':
-                    ingredient_col = col
-                    break
+            if self.nutrition.get_daily_value_matrix() is None:
+                return pd.DataFrame(index=self.recipes_data.index)
             
-            if ingredient_col is None:
-                return {}
+            columns = self.nutrition.nutrient_columns
             
-            # Собираем данные о питании для всех ингредиентов
-            recipe_nutrition = {}
+            # Учитываются только положительные значения, пропуски - нули
+            values = self.nutrition_data[columns].fillna(0).clip(lower=0).to_numpy(dtype=np.float64)
             
-            for ingredient in ingredients_list:
-                # Ищем ингредиент в базе данных
-                ingredient_data = self.nutrition_data[
-                    self.nutrition_data[ingredient_col].str.lower() == ingredient
-                ]
-                
-                if not ingredient_data.empty:
-                    # Добавляем данные о питании для каждого питательного вещества
-                    for col in ingredient_data.columns:
-                        if col != ingredient_col and col in self.daily_values['nutrient'].values:
-                            value = ingredient_data[col].iloc[0]
-                            if pd.notna(value) and value > 0:
-                                if col not in recipe_nutrition:
-                                    recipe_nutrition[col] = 0
-                                recipe_nutrition[col] += value
-            
-            return recipe_nutrition
+            recipe_ingredients = self.ingredient_matrix @ self._ingredient_nutrition_map()
+            totals = np.asarray(recipe_ingredients @ values)
+            
+            return pd.DataFrame(
+                totals / self.nutrition.nutrient_daily_values * 100,
+                index=self.recipes_data.index,
+                columns=columns
+            )
             
         except Exception as e:
-            print(f"Ошибка расчета пищевой ценности рецепта: {e}")
-            return {}
+            print(f"Ошибка расчета пищевой ценности рецептов: {e}")
+            return pd.DataFrame(index=self.recipes_data.index)
+    
+    def _calculate_nutrition_scores(self, percentages):
+        """
+        Расчет оценок пищевой ценности сразу для всех рецептов
+        
+        Каждый ненулевой процент от дневной нормы переводится в балл по полосам
+        NUTRITION_SCORE_BANDS (первая подходящая полоса), оценка рецепта -
+        средний балл по питательным веществам, которые в нем есть.
+        
+        Args:
+            percentages (np.ndarray): Проценты от дневной нормы, рецепты x питательные вещества
+            
+        Returns:
+            np.ndarray: Оценка пищевой ценности (0-100) для каждого рецепта
+        """
+        percentages = np.asarray(percentages, dtype=np.float64)
+        
+        scores = np.select(
+            [(low <= percentages) & (percentages <= high) for low, high, _ in NUTRITION_SCORE_BANDS],
+            [score for _, _, score in NUTRITION_SCORE_BANDS],
+            default=NUTRITION_SCORE_DEFAULT
+        )
+        
+        # Учитываются только питательные вещества, которые есть в рецепте
+        present = percentages > 0
+        counts = present.sum(axis=1)
+        totals = np.where(present, scores, 0).sum(axis=1)
+        
+        return np.divide(totals, counts, out=np.zeros(len(percentages)), where=counts > 0)
     
     def _calculate_nutrition_score(self, recipe_nutrition):
         """
-        Расчет оценки пищевой ценности рецепта
+        Расчет оценки пищевой ценности одного рецепта
         
         Args:
-            recipe_nutrition (dict): Словарь с пищевой ценностью рецепта
+            recipe_nutrition (pd.Series): Проценты от дневной нормы по питательным веществам
             
         Returns:
             float: Оценка пищевой ценности (0-100)
         """
-        if not recipe_nutrition:
-            return 0.0
-        
         try:
-            total_score = 0
-            nutrient_count = 0
-            
-            for nutrient, value in recipe_nutrition.items():
-                # Ищем дневную норму для этого питательного вещества
-                daily_value = self.daily_values[
-                    self.daily_values['nutrient'] == nutrient
-                ]['daily_value'].values
-                
-                if len(daily_value) > 0:
-                    daily_value = daily_value[0]
-                    
-                    # Вычисляем процент от дневной нормы
-                    percentage = (value / daily_value) * 100
-                    
-                    # Оценка: оптимально 20-30% от дневной нормы за прием пищи
-                    if 20 <= percentage <= 30:
-                        score = 100  # Отлично
-                    elif 15 <= percentage <= 40:
-                        score = 80   # Хорошо
-                    elif 10 <= percentage <= 50:
-                        score = 60   # Удовлетворительно
-                    elif 5 <= percentage <= 70:
-                        score = 40   # Плохо
-                    else:
-                        score = 20   # Очень плохо
-                    
-                    total_score += score
-                    nutrient_count += 1
-            
-            if nutrient_count == 0:
-                return 0.0
-            
-            return total_score / nutrient_count
+            values = np.asarray(list(recipe_nutrition.values), dtype=np.float64).reshape(1, -1)
+            return float(self._calculate_nutrition_scores(values)[0])
             
         except Exception as e:
             print(f"Ошибка расчета оценки пищевой ценности: {e}")
             return 0.0
     
+    def _recipe_nutrition_dict(self, recipe_index):
+        """
+        Ненулевые проценты от дневной нормы для одного рецепта
+        
+        Args:
+            recipe_index: Индекс рецепта в recipes_data
+            
+        Returns:
+            dict: Питательное вещество -> процент от дневной нормы
+        """
+        if self.recipe_nutrition is None or self.recipe_nutrition.columns.empty:
+            return {}
+        
+        row = self.recipe_nutrition.loc[recipe_index]
+        return {nutrient: value for nutrient, value in row.items() if value > 0}
+    
+    def _prepare_recipes(self):
+        """
+        Подготовка рецептов для меню (один раз)
+        
+        Строит матрицу ингредиентов, категории времени приема пищи,
+        таблицу пищевой ценности recipe_nutrition и колонки оценок
+        nutrition_score и total_score.
+        """
+        if self.recipe_nutrition is not None and 'total_score' in self.recipes_data.columns:
+            return
+        
+        # Матрица ингредиентов из бинарных колонок и список ингредиентов для отображения
+        if self.ingredient_matrix is None:
+            self.ingredient_matrix, self.ingredient_names = build_ingredient_matrix(self.recipes_data)
+        
+        if 'ingredients_list' not in self.recipes_data.columns:
+            self.recipes_data['ingredients_list'] = ingredient_strings(
+                self.ingredient_matrix, self.ingredient_names
+            )
+        
+        # Категоризируем рецепты по времени приема пищи
+        empty = pd.Series('', index=self.recipes_data.index)
+        self.recipes_data['meal_time'] = self._categorize_meal_times(
+            self.recipes_data.get('title', empty),
+            self.recipes_data.get('ingredients_list', empty)
+        )
+        
+        # Вычисляем пищевую ценность сразу для всех рецептов
+        self.recipe_nutrition = self._calculate_recipe_nutrition()
+        
+        self.recipes_data['nutrition_score'] = self._calculate_nutrition_scores(
+            self.recipe_nutrition.to_numpy(dtype=np.float64)
+        )
+        
+        # Вычисляем общую оценку рецепта (рейтинг + пищевая ценность)
+        rating = self.recipes_data['rating'] if 'rating' in self.recipes_data.columns else 0
+        self.recipes_data['total_score'] = rating * 0.6 + self.recipes_data['nutrition_score'] * 0.4
+    
+    def _menu_entry(self, recipe):
+        """
+        Описание блюда для меню
+        
+        Args:
+            recipe (pd.Series): Строка recipes_data
+            
+        Returns:
+            dict: Название, рейтинг, ингредиенты, пищевая ценность, ссылка и оценка
+        """
+        return {
+            'title': recipe.get('title', 'Без названия'),
+            'rating': recipe.get('rating', 0),
+            'ingredients': recipe.get('ingredients_list', ''),
+            'nutrition': self._recipe_nutrition_dict(recipe.name),
+            'url': recipe.get('url', ''),
+            'total_score': recipe.get('total_score', 0)
+        }
+    
     def generate_daily_menu(self):
         """
         Генерация дневного меню
@@ -613,43 +2047,12 @@ class DailyMenuGenerator:
             return {}
         
         try:
-            # Создаем список ингредиентов для каждого рецепта, если его нет
-            if 'ingredients_list' not in self.recipes_data.columns:
-                ingredient_cols = [col for col in self.recipes_data.columns 
-                                 if col not in ['rating', 'title', 'calories', 'protein', 'fat', 'sodium']]
-                
-                self.recipes_data['ingredients_list'] = self.recipes_data[ingredient_cols].apply(
-                    lambda row: ', '.join([col for col in ingredient_cols if row[col] == 1]), 
-                    axis=1
-                )
-            
-            # Категоризируем рецепты по времени приема пищи
-            self.recipes_data['meal_time'] = self.recipes_data.apply(
-                lambda row: self._categorize_meal_time(
-                    row.get('title', ''), 
-                    row.get('ingredients_list', '')
-                ), 
-                axis=1
-            )
-            
-            # Вычисляем пищевую ценность для каждого рецепта
-            self.recipes_data['nutrition_score'] = self.recipes_data['ingredients_list'].apply(
-                self._calculate_recipe_nutrition
-            )
-            
-            # Вычисляем общую оценку рецепта (рейтинг + пищевая ценность)
-            self.recipes_data['total_score'] = self.recipes_data.apply(
-                lambda row: (
-                    (row.get('rating', 0) * 0.6) + 
-                    (self._calculate_nutrition_score(row.get('nutrition_score', {})) * 0.4)
-                ), 
-                axis=1
-            )
+            self._prepare_recipes()
             
             # Генерируем меню для каждого времени приема пищи
             daily_menu = {}
             
-            for meal_time in ['breakfast', 'lunch', 'dinner']:
+            for meal_time in MEAL_TIMES:
                 # Фильтруем рецепты для конкретного времени приема пищи
                 meal_recipes = self.recipes_data[
                     self.recipes_data['meal_time'] == meal_time
@@ -658,26 +2061,11 @@ class DailyMenuGenerator:
                 if not meal_recipes.empty:
                     # Сортируем по общей оценке и выбираем лучший
                     best_recipe = meal_recipes.sort_values('total_score', ascending=False).iloc[0]
-                    
-                    daily_menu[meal_time] = {
-                        'title': best_recipe.get('title', 'Без названия'),
-                        'rating': best_recipe.get('rating', 0),
-                        'ingredients': best_recipe.get('ingredients_list', ''),
-                        'nutrition': best_recipe.get('nutrition_score', {}),
-                        'url': best_recipe.get('url', ''),
-                        'total_score': best_recipe.get('total_score', 0)
-                    }
+                    daily_menu[meal_time] = self._menu_entry(best_recipe)
                 else:
                     # Если нет рецептов для конкретного времени, берем случайный
                     random_recipe = self.recipes_data.sample(n=1).iloc[0]
-                    daily_menu[meal_time] = {
-                        'title': random_recipe.get('title', 'Без названия'),
-                        'rating': random_recipe.get('rating', 0),
-                        'ingredients': random_recipe.get('ingredients_list', ''),
-                        'nutrition': random_recipe.get('nutrition_score', {}),
-                        'url': random_recipe.get('url', ''),
-                        'total_score': random_recipe.get('total_score', 0)
-                    }
+                    daily_menu[meal_time] = self._menu_entry(random_recipe)
             
             print("Дневное меню успешно сгенерировано")
             return daily_menu
@@ -686,6 +2074,187 @@ class DailyMenuGenerator:
             print(f"Ошибка генерации дневного меню: {e}")
             return {}
     
+    def _candidate_pool(self, meal_time, ratings, used, size):
+        """
+        Кандидаты для одного приема пищи
+        
+        Половина - лучшие по рейтингу, половина - лучшие по общей оценке
+        (рейтинг + пищевая ценность). Уже использованные рецепты не берутся.
+        Если рецептов этого времени нет, кандидаты выбираются из всех рецептов.
+        
+        Args:
+            meal_time (str): Время приема пищи
+            ratings (np.ndarray): Рейтинги рецептов
+            used (np.ndarray): Маска уже выбранных рецептов
+            size (int): Максимальный размер пула
+            
+        Returns:
+            np.ndarray: Номера рецептов (позиции в recipes_data)
+        """
+        available = ~used
+        of_meal_time = available & (self.recipes_data['meal_time'].to_numpy() == meal_time)
+        positions = np.flatnonzero(of_meal_time if of_meal_time.any() else available)
+        
+        if len(positions) <= size:
+            return positions
+        
+        total_scores = self.recipes_data['total_score'].fillna(0).to_numpy(dtype=np.float64)
+        half = size // 2
+        
+        by_rating = positions[np.argpartition(-ratings[positions], half)[:half]]
+        by_total = positions[np.argpartition(-total_scores[positions], size - half)[:size - half]]
+        
+        return np.unique(np.concatenate([by_rating, by_total]))
+    
+    def _plan_day(self, pools, ratings, nutrients, daily_band, beam_width, nutrient_penalty):
+        """
+        Лучшее сочетание блюд на один день лучевым поиском
+        
+        Оценка дня - сумма рейтингов минус штраф за каждый процентный пункт
+        итоговой пищевой ценности вне полосы daily_band. Частичные планы
+        ранжируются по верхней оценке: рейтинг уже выбранных блюд плюс лучший
+        рейтинг оставшихся минус штраф за превышение верхней границы
+        (превышение при добавлении блюд может только вырасти).
+        Если в каждом сочетании какое-то блюдо повторяется, выбрасывает ValueError.
+        
+        Args:
+            pools (list): Кандидаты для каждого приема пищи
+            ratings (np.ndarray): Рейтинги рецептов
+            nutrients (np.ndarray): Проценты от дневной нормы, рецепты x питательные вещества
+            daily_band (tuple): Допустимая полоса (от, до) в процентах от дневной нормы
+            beam_width (int): Сколько частичных планов оставлять на каждом шаге
+            nutrient_penalty (float): Штраф за процентный пункт вне полосы
+            
+        Returns:
+            tuple: (номера рецептов по приемам пищи, итог по питательным веществам, оценка дня)
+        """
+        low, high = daily_band
+        best_remaining = np.cumsum([ratings[pool].max() for pool in pools][::-1])[::-1]
+        best_remaining = np.append(best_remaining, 0.0)
+        
+        plans = np.empty((1, 0), dtype=np.int64)
+        rating_sums = np.zeros(1)
+        totals = np.zeros((1, nutrients.shape[1]))
+        
+        for step, pool in enumerate(pools):
+            # Все продолжения частичных планов кандидатами этого приема пищи
+            plans = np.hstack([np.repeat(plans, len(pool), axis=0), np.tile(pool, len(rating_sums))[:, None]])
+            rating_sums = np.repeat(rating_sums, len(pool)) + np.tile(ratings[pool], len(rating_sums))
+            totals = np.repeat(totals, len(pool), axis=0) + np.tile(nutrients[pool], (len(totals), 1))
+            
+            penalty = np.clip(totals - high, 0, None).sum(axis=1)
+            if step == len(pools) - 1:
+                penalty += np.clip(low - totals, 0, None).sum(axis=1)
+            
+            bounds = rating_sums + best_remaining[step + 1] - nutrient_penalty * penalty
+            
+            # Один рецепт дважды за день (пулы пересекаются, если берутся из всех рецептов).
+            # Такие планы отбрасываются сразу: иначе они остались бы в луче и получили
+            # конечную оценку на следующем шаге, где проверяется только новое блюдо
+            if step > 0:
+                distinct = ~(plans[:, :-1] == plans[:, -1:]).any(axis=1)
+                plans, rating_sums, totals, bounds = plans[distinct], rating_sums[distinct], totals[distinct], bounds[distinct]
+                
+                if len(bounds) == 0:
+                    raise ValueError("Нет сочетания блюд без повторов: пулы кандидатов состоят из одних и тех же рецептов")
+            
+            if len(bounds) > beam_width:
+                keep = np.argpartition(-bounds, beam_width)[:beam_width]
+                plans, rating_sums, totals, bounds = plans[keep], rating_sums[keep], totals[keep], bounds[keep]
+        
+        best = np.argmax(bounds)
+        return plans[best], totals[best], bounds[best]
+    
+    def plan_menu(self, days=7, daily_band=(50, 150), candidates=300, beam_width=200, nutrient_penalty=0.05):
+        """
+        Меню на несколько дней без повторов блюд
+        
+        Для каждого дня подбирается сочетание завтрака, обеда и ужина
+        с максимальным суммарным рейтингом при итоговой пищевой ценности
+        в пределах полосы от дневной нормы. Используются заранее посчитанные
+        векторы пищевой ценности рецептов.
+        
+        Args:
+            days (int): Количество дней
+            daily_band (tuple): Полоса (от, до) итога за день в процентах от дневной нормы
+            candidates (int): Размер пула кандидатов для каждого приема пищи
+            beam_width (int): Ширина луча при поиске сочетаний
+            nutrient_penalty (float): Штраф (в единицах рейтинга) за процентный пункт вне полосы
+            
+        Returns:
+            list: Меню по дням - словари с блюдами по времени приема пищи,
+                итоговой пищевой ценностью ('nutrition') и оценкой дня ('score')
+        """
+        if self.recipes_data.empty:
+            print("Нет данных о рецептах для генерации меню")
+            return []
+        
+        try:
+            self._prepare_recipes()
+            
+            nutrients = self.recipe_nutrition.to_numpy(dtype=np.float64)
+            if 'rating' in self.recipes_data.columns:
+                ratings = self.recipes_data['rating'].fillna(0).to_numpy(dtype=np.float64)
+            else:
+                ratings = np.zeros(len(self.recipes_data))
+            
+            used = np.zeros(len(self.recipes_data), dtype=bool)
+            plan = []
+            
+            for _ in range(days):
+                pools = [self._candidate_pool(meal_time, ratings, used, candidates) for meal_time in MEAL_TIMES]
+                
+                if any(len(pool) == 0 for pool in pools):
+                    print("Недостаточно рецептов для меню без повторов")
+                    break
+                
+                try:
+                    recipe_positions, totals, score = self._plan_day(
+                        pools, ratings, nutrients, daily_band, beam_width, nutrient_penalty
+                    )
+                except ValueError as e:
+                    print(f"Недостаточно рецептов для меню без повторов: {e}")
+                    break
+                
+                used[recipe_positions] = True
+                
+                day_menu = {
+                    meal_time: self._menu_entry(self.recipes_data.iloc[position])
+                    for meal_time, position in zip(MEAL_TIMES, recipe_positions)
+                }
+                day_menu['nutrition'] = dict(zip(self.recipe_nutrition.columns, totals))
+                day_menu['score'] = float(score)
+                plan.append(day_menu)
+            
+            print(f"Меню на {len(plan)} дн. успешно сгенерировано")
+            return plan
+            
+        except Exception as e:
+            print(f"Ошибка генерации меню на несколько дней: {e}")
+            return []
+    
+    def display_menu_plan(self, plan):
+        """
+        Отображение меню на несколько дней
+        
+        Args:
+            plan (list): Результат plan_menu
+        """
+        if not plan:
+            print("Нет данных для отображения меню")
+            return
+        
+        for day, day_menu in enumerate(plan, start=1):
+            print("=" * 50)
+            print(f"ДЕНЬ {day} (оценка: {day_menu['score']:.3f})")
+            print("=" * 50)
+            self.display_daily_menu(day_menu)
+            
+            print("Итого за день:")
+            for nutrient, value in day_menu['nutrition'].items():
+                print(f"- {nutrient}: {value:.1f}%")
+            print()
+    
     def display_daily_menu(self, daily_menu):
         """
         Отображение дневного меню в красивом формате
@@ -713,15 +2282,8 @@ class DailyMenuGenerator:
                 
                 print("Питательные вещества:")
                 for nutrient, value in breakfast['nutrition'].items():
-                    if pd.notna(value) and value > 0:
-                        # Ищем дневную норму
-                        daily_value = self.daily_values[
-                            self.daily_values['nutrient'] == nutrient
-                        ]['daily_value'].values
-                        
-                        if len(daily_value) > 0:
-                            percentage = (value / daily_value[0]) * 100
-                            print(f"- {nutrient}: {percentage:.1f}%")
+                    # Пищевая ценность уже в процентах от дневной нормы
+                    print(f"- {nutrient}: {value:.1f}%")
                 
                 if breakfast['url']:
                     print(f"URL: {breakfast['url']}")
@@ -742,14 +2304,7 @@ class DailyMenuGenerator:
                 
                 print("Питательные вещества:")
                 for nutrient, value in lunch['nutrition'].items():
-                    if pd.notna(value) and value > 0:
-                        daily_value = self.daily_values[
-                            self.daily_values['nutrient'] == nutrient
-                        ]['daily_value'].values
-                        
-                        if len(daily_value) > 0:
-                            percentage = (value / daily_value[0]) * 100
-                            print(f"- {nutrient}: {percentage:.1f}%")
+                    print(f"- {nutrient}: {value:.1f}%")
                 
                 if lunch['url']:
                     print(f"URL: {lunch['url']}")
@@ -770,14 +2325,7 @@ class DailyMenuGenerator:
                 
                 print("Питательные вещества:")
                 for nutrient, value in dinner['nutrition'].items():
-                    if pd.notna(value) and value > 0:
-                        daily_value = self.daily_values[
-                            self.daily_values['nutrient'] == nutrient
-                        ]['daily_value'].values
-                        
-                        if len(daily_value) > 0:
-                            percentage = (value / daily_value[0]) * 100
-                            print(f"- {nutrient}: {percentage:.1f}%")
+                    print(f"- {nutrient}: {value:.1f}%")
                 
                 if dinner['url']:
                     print(f"URL: {dinner['url']}")
@@ -787,6 +2335,55 @@ class DailyMenuGenerator:
             print(f"Ошибка отображения меню: {e}")
 
 
+COLD_START_MODULES = ['pandas', 'numpy', 'scipy', 'sklearn', 'recipes']
+COLD_START_BUDGET_MS = 100
+
+
+def check_cold_start(script=None, heavy_modules=COLD_START_MODULES, budget_ms=COLD_START_BUDGET_MS):
+    """
+    Проверка холодного старта nutritionist.py --help через python -X importtime
+    
+    Args:
+        script (str): Путь к nutritionist.py (по умолчанию рядом с модулем)
+        heavy_modules (list): Модули, которые не должны импортироваться для --help
+        budget_ms (float): Бюджет суммарного собственного времени импортов, мс
+        
+    Returns:
+        float: Суммарное собственное время импортов, мс
+        
+    Raises:
+        AssertionError: Если --help завершился с ошибкой, импортировал тяжелые
+            модули или превысил бюджет времени
+    """
+    if script is None:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nutritionist.py")
+    
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script, "--help"],
+        capture_output=True, text=True, timeout=120
+    )
+    
+    assert result.returncode == 0, f"--help завершился с кодом {result.returncode}: {result.stderr.strip()[-500:]}"
+    
+    # Строки -X importtime: "import time: собственное [us] | суммарное [us] | модуль"
+    imports = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            self_us, _, module = line[len("import time:"):].split("|")
+            if self_us.strip().isdigit():
+                imports[module.strip()] = int(self_us)
+    
+    assert imports, "вывод -X importtime пуст"
+    
+    loaded_heavy = [module for module in heavy_modules if module in imports]
+    assert not loaded_heavy, f"--help импортирует тяжелые модули: {loaded_heavy}"
+    
+    total_ms = sum(imports.values()) / 1000
+    assert total_ms <= budget_ms, f"импорты для --help: {total_ms:.1f} мс, бюджет {budget_ms} мс"
+    
+    return total_ms
+
+
 if __name__ == "__main__":
     """
     Тестирование модуля при запуске напрямую
@@ -809,6 +2406,14 @@ if __name__ == "__main__":
                 print("✓ Трансформация данных работает")
             else:
                 print("✗ Трансформация данных не работает")
+            
+            # Изменение результата не должно портить запомненную трансформацию
+            column = nutrition.nutrient_columns[0]
+            transformed[column] = -1.0
+            if (nutrition.transform_data()[column] != -1.0).any():
+                print("✓ Запомненная трансформация не меняется вызывающим кодом")
+            else:
+                print("✗ Изменение результата transform_data портит запомненные данные")
         
     except Exception as e:
         print(f"✗ Ошибка создания NutritionFacts: {e}")
@@ -827,6 +2432,19 @@ if __name__ == "__main__":
                 print("✓ Поиск похожих рецептов работает")
             else:
                 print("✗ Поиск похожих рецептов не работает")
+            
+            # Колонки с запятой разбиваются на токены, как в CountVectorizer по строкам ингредиентов
+            token_map, tokens = ingredient_tokens(["Washington, D.C.", "milk", "Milk"])
+            if tokens == ["d.c.", "milk", "washington"] and token_map.toarray().tolist() == [[1, 0, 1], [0, 1, 0], [0, 1, 0]]:
+                print("✓ Названия ингредиентов с запятой разбиваются на токены")
+            else:
+                print(f"✗ Неверные токены ингредиентов: {tokens}")
+            
+            # Фильтр только из пустых названий не должен возвращать все рецепты
+            if len(recommender.find_recipe_ids(all_of=[" "])) == 0 and len(recommender.find_recipe_ids(any_of=["", " "])) == 0:
+                print("✓ Пустой фильтр ингредиентов не находит рецептов")
+            else:
+                print("✗ Пустой фильтр ингредиентов возвращает рецепты")
         
     except Exception as e:
         print(f"✗ Ошибка создания RecipeRecommender: {e}")
@@ -850,5 +2468,66 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"✗ Ошибка создания DailyMenuGenerator: {e}")
     
+    # Тест холодного старта CLI: --help не должен импортировать тяжелые модули
+    # Провал этой проверки завершает самотестирование с ненулевым кодом
+    print("\n4. Тестирование холодного старта nutritionist.py --help...")
+    failed_checks = []
+    try:
+        total_ms = check_cold_start()
+        print(f"✓ Импорты для --help: {total_ms:.1f} мс (бюджет {COLD_START_BUDGET_MS} мс)")
+        
+    except (AssertionError, subprocess.SubprocessError) as e:
+        print(f"✗ Холодный старт: {e}")
+        failed_checks.append("холодный старт nutritionist.py --help")
+    
+    # Тест нечеткого сопоставления ингредиентов
+    print("\n5. Тестирование IngredientResolver...")
+    try:
+        resolver = IngredientResolver(["milk", "honey", "garlic", "parmesan", "cream cheese"])
+        cases = {"Milk": "milk", "hony": "honey", "garlik": "garlic", "parmesan cheese": "parmesan", "qqqq": None}
+        
+        resolved = dict(zip(cases, resolver.resolve_many(list(cases))))
+        if resolved == cases:
+            print("✓ Нечеткое сопоставление работает")
+        else:
+            print(f"✗ Нечеткое сопоставление работает неверно: {resolved}")
+        
+        resolver = IngredientResolver.from_sources(nutrition, recommender)
+        queries = ["tomatos", "chiken", "strawbery", "onions"] * 250
+        
+        start = time.perf_counter()
+        resolver.resolve_many(queries)
+        per_query_ms = (time.perf_counter() - start) / len(queries) * 1000
+        
+        if per_query_ms < 1:
+            print(f"✓ Сопоставление: {per_query_ms:.3f} мс/запрос по {len(resolver.names)} названиям")
+        else:
+            print(f"✗ Сопоставление медленнее 1 мс: {per_query_ms:.3f} мс/запрос")
+        
+    except Exception as e:
+        print(f"✗ Ошибка тестирования IngredientResolver: {e}")
+    
+    # Тест упакованной модели: предсказания совпадают с моделью sklearn
+    print("\n6. Тестирование CompiledTreeModel...")
+    try:
+        model = RatingForecaster.load("best_model.pkl", mmap_mode=None).model
+        
+        if model is not None:
+            compiled = CompiledTreeModel.from_model(model)
+            rng = np.random.default_rng(21)
+            features = sparse.csr_matrix((rng.random((1000, model.n_features_in_)) < 0.02).astype(np.float32))
+            
+            if np.array_equal(model.predict(features), compiled.predict(features)):
+                print("✓ Предсказания упакованной модели совпадают с моделью sklearn")
+            else:
+                print("✗ Предсказания упакованной модели отличаются от модели sklearn")
+        
+    except Exception as e:
+        print(f"✗ Ошибка тестирования CompiledTreeModel: {e}")
+    
     print("\n" + "=" * 50)
-    print("Тестирование завершено")
\ No newline at end of file
+    print("Тестирование завершено")
+    
+    if failed_checks:
+        print(f"Провалены проверки: {', '.join(failed_checks)}")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Обучение модели прогноза класса рейтинга (bad, so-so, great) по ингредиентам
+
+Повторяет перебор моделей из recipes.ipynb, но признаки остаются разреженными,
+разбиение на фолды считается один раз и кэшируется рядом с файлом рецептов,
+а пары (кандидат, фолд) обучаются параллельно. Лучшая модель сохраняется
+пакетом RatingForecaster (модель + признаки + классы), который nutritionist.py
+загружает без дополнительной настройки. С --compile рядом сохраняется
+упакованная модель .npz (CompiledTreeModel), которую nutritionist.py
+предпочитает pkl: она меньше и быстрее на одиночных запросах.
+
+Запуск: python train_rating_model.py [recipes.csv] [--output best_model.pkl] [--n-jobs -1] [--compile]
+        python train_rating_model.py --export best_model.pkl
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+from recipes import (
+    RATING_CLASSES, RatingForecaster, build_ingredient_matrix, file_hash, load_recipes, rating_class
+)
+
+
+# Модели и сетки параметров (как в recipes.ipynb)
+MODELS = {
+    'Logistic Regression': (LogisticRegression(max_iter=1000), {'C': [0.1, 1, 10]}),
+    'Decision Tree': (DecisionTreeClassifier(random_state=42), {'max_depth': [3, 5, 7]}),
+    'Random Forest': (RandomForestClassifier(random_state=42), {'n_estimators': [50, 100, 200], 'max_depth': [3, 5, 7]}),
+    'Gradient Boosting': (GradientBoostingClassifier(random_state=42), {'n_estimators': [50, 100, 200], 'learning_rate': [0.01, 0.1, 1]}),
+}
+
+
+def load_training_data(recipes_file):
+    """
+    Разреженная матрица признаков и коды классов рейтинга
+
+    Признаки - те же бинарные колонки ингредиентов, что и у RecipeRecommender,
+    поэтому сохраненная модель совпадает по признакам с nutritionist.py.
+    Как в recipes.ipynb, пропуски рейтинга заменяются медианой, а рецепты
+    без ингредиентов отбрасываются.
+
+    Args:
+        recipes_file (str): Путь к файлу с рецептами
+
+    Returns:
+        tuple: (csr_matrix рецепты x ингредиенты float32, коды классов, названия признаков)
+    """
+    recipes_data = load_recipes(recipes_file)
+    matrix, feature_names = build_ingredient_matrix(recipes_data)
+
+    rating = recipes_data['rating'].fillna(recipes_data['rating'].median())
+    codes = {label: code for code, label in enumerate(RATING_CLASSES)}
+    target = np.array([codes[rating_class(value)] for value in rating], dtype=np.int64)
+
+    has_ingredients = matrix.getnnz(axis=1) > 0
+    return matrix[has_ingredients].astype(np.float32), target[has_ingredients], feature_names
+
+
+def fold_assignment(recipes_file, target, n_splits=5, seed=42):
+    """
+    Номер фолда кросс-валидации для каждого рецепта (с кэшем на диске)
+
+    Разбиение одно для всех кандидатов. Кэш <recipes>.folds.npz действителен,
+    пока не изменились содержимое файла рецептов, число фолдов и зерно.
+
+    Args:
+        recipes_file (str): Путь к файлу с рецептами
+        target (np.ndarray): Коды классов (для стратификации)
+        n_splits (int): Число фолдов
+        seed (int): Зерно генератора
+
+    Returns:
+        np.ndarray: Номер фолда для каждого рецепта
+    """
+    cache_file = os.path.splitext(recipes_file)[0] + ".folds.npz"
+    source_hash = file_hash(recipes_file)
+
+    try:
+        with np.load(cache_file) as cached:
+            if (str(cached['source_hash']) == source_hash and int(cached['n_splits']) == n_splits
+                    and int(cached['seed']) == seed and len(cached['folds']) == len(target)):
+                print(f"Фолды загружены из кэша: {cache_file}")
+                return cached['folds']
+    except (OSError, KeyError, ValueError):
+        pass
+
+    folds = np.empty(len(target), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for fold, (_, test_ids) in enumerate(splitter.split(np.zeros(len(target)), target)):
+        folds[test_ids] = fold
+
+    try:
+        np.savez(cache_file, folds=folds, source_hash=source_hash, n_splits=n_splits, seed=seed)
+    except OSError as e:
+        print(f"Не удалось сохранить кэш фолдов: {e}")
+
+    return folds
+
+
+def candidates(models=None):
+    """
+    Все кандидаты: модель с одним набором параметров из сетки
+
+    Args:
+        models (dict): Название -> (модель, сетка параметров). По умолчанию MODELS
+
+    Returns:
+        list: Тройки (название, модель, параметры)
+    """
+    models = models or MODELS
+    return [(name, model, params) for name, (model, grid) in models.items() for params in ParameterGrid(grid)]
+
+
+def fit_and_score(model, params, features, target, train_ids, test_ids):
+    """
+    Обучение одного кандидата на одном фолде
+
+    Args:
+        model: Модель sklearn (не изменяется)
+        params (dict): Параметры модели
+        features (csr_matrix): Признаки
+        target (np.ndarray): Коды классов
+        train_ids (np.ndarray): Номера рецептов для обучения
+        test_ids (np.ndarray): Номера рецептов для проверки
+
+    Returns:
+        float: Доля верных ответов на проверочной части
+    """
+    estimator = clone(model).set_params(**params)
+    estimator.fit(features[train_ids], target[train_ids])
+    return accuracy_score(target[test_ids], estimator.predict(features[test_ids]))
+
+
+def export_compiled_model(model_file, output_file=None):
+    """
+    Упаковка сохраненной модели деревьев в .npz
+
+    Args:
+        model_file (str): Файл модели (пакет RatingForecaster или модель joblib)
+        output_file (str): Куда сохранить. По умолчанию - рядом, с расширением .npz
+
+    Returns:
+        str: Путь к упакованной модели
+    """
+    output_file = output_file or os.path.splitext(model_file)[0] + ".npz"
+    forecaster = RatingForecaster.load(model_file, mmap_mode=None)
+
+    if forecaster.model is None:
+        raise FileNotFoundError(f"Не удалось загрузить модель {model_file}")
+
+    forecaster.save(output_file)
+    print(f"Упакованная модель сохранена в {output_file}: "
+          f"{os.path.getsize(model_file)} -> {os.path.getsize(output_file)} байт")
+
+    return output_file
+
+
+def train_rating_model(recipes_file, output_file="best_model.pkl", n_splits=5, n_jobs=-1, models=None, seed=42,
+                       compile_model=False):
+    """
+    Перебор моделей кросс-валидацией и сохранение лучшей
+
+    Все пары (кандидат, фолд) считаются одним пулом joblib на n_jobs процессах.
+    Лучший по средней точности на фолдах кандидат переобучается на всей
+    обучающей части, проверяется на отложенных 20% и сохраняется пакетом
+    RatingForecaster.
+
+    Args:
+        recipes_file (str): Путь к файлу с рецептами
+        output_file (str): Куда сохранить модель
+        n_splits (int): Число фолдов
+        n_jobs (int): Число процессов (-1 - все ядра)
+        models (dict): Название -> (модель, сетка параметров). По умолчанию MODELS
+        seed (int): Зерно для отложенной выборки и фолдов
+        compile_model (bool): Сохранить также упакованную модель .npz (для моделей деревьев)
+
+    Returns:
+        dict: Название, параметры и точность лучшей модели
+    """
+    features, target, feature_names = load_training_data(recipes_file)
+    print(f"Признаки: {features.shape[0]} рецептов x {features.shape[1]} ингредиентов, "
+          f"ненулевых {features.nnz}")
+
+    train_ids, test_ids = train_test_split(
+        np.arange(len(target)), test_size=0.2, random_state=seed, stratify=target
+    )
+
+    # Фолды строятся по всей выборке и ограничиваются обучающей частью
+    folds = fold_assignment(recipes_file, target, n_splits, seed)[train_ids]
+    splits = [(train_ids[folds != fold], train_ids[folds == fold]) for fold in range(n_splits)]
+
+    grid = candidates(models)
+    start = time.perf_counter()
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(fit_and_score)(model, params, features, target, fold_train, fold_test)
+        for _, model, params in grid
+        for fold_train, fold_test in splits
+    )
+    print(f"Обучено {len(scores)} моделей ({len(grid)} кандидатов x {n_splits} фолдов) "
+          f"за {time.perf_counter() - start:.1f} с")
+
+    mean_scores = np.asarray(scores).reshape(len(grid), n_splits).mean(axis=1)
+    for (name, _, params), score in zip(grid, mean_scores):
+        print(f"  {name} {params}: {score:.3f}")
+
+    best = int(np.argmax(mean_scores))
+    name, model, params = grid[best]
+
+    best_model = clone(model).set_params(**params)
+    best_model.fit(features[train_ids], target[train_ids])
+    test_accuracy = accuracy_score(target[test_ids], best_model.predict(features[test_ids]))
+
+    # Наивный классификатор - самый частый класс обучающей части
+    naive_accuracy = np.mean(target[test_ids] == np.bincount(target[train_ids]).argmax())
+
+    print(f"Лучшая модель: {name} {params}, точность на фолдах {mean_scores[best]:.3f}, "
+          f"на отложенной выборке {test_accuracy:.3f} (наивная {naive_accuracy:.3f})")
+
+    RatingForecaster(best_model, feature_names, RATING_CLASSES).save(output_file)
+    print(f"Модель сохранена в {output_file}")
+
+    if compile_model:
+        try:
+            export_compiled_model(output_file)
+        except ValueError as e:
+            print(f"Модель не упакована: {e}")
+
+    return {'name': name, 'params': params, 'cv_accuracy': float(mean_scores[best]), 'test_accuracy': float(test_accuracy)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обучение модели прогноза рейтинга по ингредиентам")
+    parser.add_argument("recipes", nargs='?', default="recipes.csv", help="Файл с рецептами")
+    parser.add_argument("--output", default="best_model.pkl", help="Куда сохранить модель")
+    parser.add_argument("--folds", type=int, default=5, help="Число фолдов кросс-валидации")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Число процессов (-1 - все ядра)")
+    parser.add_argument("--compile", action="store_true", help="Сохранить также упакованную модель .npz")
+    parser.add_argument("--export", metavar="MODEL", help="Только упаковать уже обученную модель в .npz")
+    args = parser.parse_args()
+
+    if args.export:
+        export_compiled_model(args.export)
+    else:
+        train_rating_model(args.recipes, args.output, args.folds, args.n_jobs, compile_model=args.compile)